@@ -0,0 +1,171 @@
+# backend/audit.py
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import insert
+
+from .database import SessionLocal
+from .event_feed import EventFeed, event_feed
+
+logger = logging.getLogger(__name__)
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AURORA_AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AURORA_AUDIT_BATCH_SIZE", "500"))
+# Longest time (seconds) an event waits in the queue before its batch is committed
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AURORA_AUDIT_FLUSH_INTERVAL", "0.25"))
+
+# Durability modes:
+#   "buffered" - record() returns once the event is queued; a crash can lose
+#                up to one flush interval of events
+#   "commit"   - record() returns once the group commit holding the event is done
+DURABILITY_MODES = ("buffered", "commit")
+AUDIT_DURABILITY = os.getenv("AURORA_AUDIT_DURABILITY", "buffered")
+
+# Queued by stop(): the writer commits what it has and exits
+_STOP = object()
+
+class AuditWriter:
+    # Write-behind audit pipeline. Request handlers enqueue rows; one background
+    # task drains the queue and bulk-inserts them in a single transaction per
+    # batch (group commit), running the blocking SQLAlchemy work in a thread so
+    # the event loop never waits on the database.
+    # Rows of feed-tracked models (Log, SystemEvent) are published to the
+    # event feed once their batch has committed.
+    def __init__(self, session_factory=SessionLocal, max_queue: int = AUDIT_QUEUE_SIZE,
+                 batch_size: int = AUDIT_BATCH_SIZE, flush_interval: float = AUDIT_FLUSH_INTERVAL,
+                 durability: str = AUDIT_DURABILITY, feed: Optional[EventFeed] = None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"unknown audit durability mode: {durability}")
+        self.session_factory = session_factory
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.feed = feed
+        self.queue: Optional[asyncio.Queue] = None
+        self.events_written = 0
+        self.events_failed = 0
+        self.batches_written = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            if self.queue is None:
+                self.queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Explicit flush on shutdown: everything queued so far is committed
+        if self._task is None:
+            return
+        await self.queue.put(_STOP)
+        await self._task
+        self._task = None
+        await self.flush()
+
+    async def record(self, model: Type, **values):
+        # A full queue applies backpressure to the caller instead of dropping events
+        values.setdefault("created_at", datetime.now(timezone.utc))
+        future = None
+        if self.durability == "commit":
+            future = asyncio.get_running_loop().create_future()
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.max_queue)
+        await self.queue.put((model, values, future))
+        if future is not None:
+            await future
+
+    async def flush(self):
+        while self.queue is not None and not self.queue.empty():
+            await self._write([event for event in self._drain(self.batch_size) if event is not _STOP])
+
+    def _drain(self, limit: int) -> List:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = [await self.queue.get()]
+            # Group commit: wait for more events until the batch is full or the
+            # oldest event has waited flush_interval
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                batch.extend(self._drain(self.batch_size - len(batch)))
+                remaining = deadline - loop.time()
+                if len(batch) >= self.batch_size or remaining <= 0 or _STOP in batch:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [event for event in batch if event is not _STOP]
+            await self._write(batch)
+
+    async def _write(self, batch: List[Tuple]):
+        if not batch:
+            return
+        rows: Dict[Type, List[dict]] = {}
+        for model, values, _ in batch:
+            rows.setdefault(model, []).append(values)
+        try:
+            published = await asyncio.to_thread(self._insert, rows)
+        except Exception as exc:
+            self.events_failed += len(batch)
+            logger.exception("audit batch of %d events failed", len(batch))
+            for _, _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(exc)
+            return
+        self.events_written += len(batch)
+        self.batches_written += 1
+        for _, _, future in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+        for topic, events in published.items():
+            await self.feed.publish(topic, events)
+
+    def _insert(self, rows: Dict[Type, List[dict]]) -> Dict[str, List[dict]]:
+        db = self.session_factory()
+        try:
+            inserted: Dict[Type, List[int]] = {}
+            for model, values in rows.items():
+                if self.feed is not None and self.feed.topic_for(model):
+                    inserted[model] = db.execute(insert(model).returning(model.id), values).scalars().all()
+                else:
+                    db.execute(insert(model), values)
+            db.commit()
+            # Read the committed rows back in the feed's serialized shape
+            return {
+                self.feed.topic_for(model): self.feed.load_rows(db, model, ids)
+                for model, ids in inserted.items()
+            }
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "queue_capacity": self.max_queue,
+            "events_written": self.events_written,
+            "events_failed": self.events_failed,
+            "batches_written": self.batches_written,
+            "durability": self.durability,
+        }
+
+audit_writer = AuditWriter(feed=event_feed)
@@ -1,20 +1,50 @@
 # backend/auth.py
 
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+logger = logging.getLogger(__name__)
 
 # to get a string like this run:
 # openssl rand -hex 32
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Verified tokens remembered by decode_access_token
+TOKEN_CACHE_SIZE = 10000
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt runs on its own small thread pool so a login never stalls the event
+# loop; the hash releases the GIL, so workers map onto real cores
+PASSWORD_HASH_WORKERS = int(os.getenv("AURORA_PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hash jobs allowed to queue behind the workers before new ones are refused
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("AURORA_PASSWORD_HASH_MAX_PENDING", "64"))
+
+# Seeded on first startup with the password from AURORA_<USERNAME>_PASSWORD;
+# without one a random password is generated and logged once
+DEFAULT_USERS = (
+    ("commander", "Commander"),
+    ("pilot", "Pilot"),
+    ("engineer", "Engineer"),
+)
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -28,6 +58,84 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class PasswordHasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    # Runs bcrypt on a dedicated worker pool. At most `workers` hashes run at
+    # once and at most `max_pending` more wait for a worker; beyond that
+    # callers get PasswordHasherBusy instead of piling up behind the pool.
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = max(1, workers)
+        self.max_pending = max(0, max_pending)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def _run(self, func, *args):
+        if self.in_flight >= self.workers + self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+        }
+
+password_hasher = PasswordHasher()
+
+# Verified against when the username is unknown, so a miss costs the same
+# bcrypt work as a wrong password and does not reveal which names exist
+_DUMMY_HASH = get_password_hash("aurora-x-unknown-user")
+
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[models.User]:
+    if not username or not password:
+        return None
+    result = await db.execute(select(models.User).where(models.User.username == username))
+    user = result.scalars().first()
+    if user is None or not user.is_active:
+        await password_hasher.verify(password, _DUMMY_HASH)
+        return None
+    if not await password_hasher.verify(password, user.hashed_password):
+        return None
+    return user
+
+async def create_default_users(db: AsyncSession):
+    result = await db.execute(select(models.User.username))
+    existing = set(result.scalars().all())
+    missing = [(username, role) for username, role in DEFAULT_USERS if username not in existing]
+    if not missing:
+        return
+    passwords = []
+    for username, _ in missing:
+        password = os.getenv(f"AURORA_{username.upper()}_PASSWORD")
+        if not password:
+            password = secrets.token_urlsafe(12)
+            logger.warning("created user %s with generated password %s (set AURORA_%s_PASSWORD to choose one)",
+                           username, password, username.upper())
+        passwords.append(password)
+    hashes = await asyncio.gather(*(password_hasher.hash(password) for password in passwords))
+    for (username, role), hashed in zip(missing, hashes):
+        db.add(models.User(username=username, hashed_password=hashed, role=role, is_active=True))
+    await db.commit()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -37,3 +145,58 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+class TokenCache:
+    # Verified JWT claims keyed by the token's SHA-256 digest (the raw token is
+    # never kept). Entries expire with the token's own `exp` claim; the least
+    # recently used entry is evicted once the cache is full.
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self.digest(token)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def put(self, token: str, claims: dict):
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        key = self.digest(token)
+        self.entries[key] = (claims, float(expires_at))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> Dict:
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+token_cache = TokenCache()
+
+def decode_access_token(token: str) -> dict:
+    # Raises JWTError for invalid or expired tokens; verified claims are cached
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.put(token, claims)
+    return claims
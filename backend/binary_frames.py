@@ -0,0 +1,68 @@
+# backend/binary_frames.py
+
+# Opt-in binary frame format for the radar and telemetry streams.
+#
+# Every frame starts with a 24 byte little-endian header:
+#   magic     4s   b"AXR1" (radar) or b"AXT1" (telemetry)
+#   version   u16
+#   flags     u16  reserved, 0
+#   tick      u32  stream tick the frame was produced on
+#   count     u32  radar: number of targets, telemetry: number of float fields
+#   timestamp f64  unix time in seconds
+#
+# Radar body, one packed column after the other (count entries each):
+#   ids u32, x f32, y f32, distance f32, bearing f32, type u8
+# The u8 column comes last so every 4-byte column stays aligned for typed arrays.
+#
+# Telemetry body: count f64 values in TELEMETRY_FIELDS order, then a u8 status code.
+
+import struct
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from .radar_engine import RadarTargetStore
+
+BINARY_SUBPROTOCOL = "aurora.bin.v1"
+FORMAT_VERSION = 1
+
+RADAR_MAGIC = b"AXR1"
+TELEMETRY_MAGIC = b"AXT1"
+
+HEADER = struct.Struct("<4sHHIId")
+
+RADAR_COLUMNS = (
+    ("ids", np.dtype("<u4")),
+    ("x", np.dtype("<f4")),
+    ("y", np.dtype("<f4")),
+    ("distance", np.dtype("<f4")),
+    ("bearing", np.dtype("<f4")),
+    ("type", np.dtype("u1")),
+)
+
+TELEMETRY_FIELDS = ("altitude", "speed", "fuel", "temperature", "g_force", "latitude", "longitude", "heading")
+TELEMETRY_STATUSES = ("NOMINAL", "CAUTION", "WARNING", "CRITICAL")
+_STATUS_CODES = {name: code for code, name in enumerate(TELEMETRY_STATUSES)}
+_TELEMETRY_BODY = struct.Struct("<%ddB" % len(TELEMETRY_FIELDS))
+
+def encode_radar_frame(store: RadarTargetStore, rows: Optional[np.ndarray], tick: int) -> bytes:
+    # Columns are converted straight into the output buffer, so each value is
+    # copied once per frame; the result is shared by every subscriber of the view.
+    sel = slice(None, store.count) if rows is None else rows
+    count = store.count if rows is None else len(rows)
+    size = HEADER.size + count * sum(dtype.itemsize for _, dtype in RADAR_COLUMNS)
+    buf = bytearray(size)
+    HEADER.pack_into(buf, 0, RADAR_MAGIC, FORMAT_VERSION, 0, tick & 0xFFFFFFFF, count, time.time())
+    offset = HEADER.size
+    for name, dtype in RADAR_COLUMNS:
+        column = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+        column[:] = getattr(store, "_" + name)[sel]
+        offset += count * dtype.itemsize
+    return bytes(buf)
+
+def encode_telemetry_frame(telemetry: Dict, tick: int) -> bytes:
+    header = HEADER.pack(TELEMETRY_MAGIC, FORMAT_VERSION, 0, tick & 0xFFFFFFFF, len(TELEMETRY_FIELDS), time.time())
+    values = [float(telemetry[name]) for name in TELEMETRY_FIELDS]
+    status = _STATUS_CODES.get(telemetry.get("status"), 0)
+    return header + _TELEMETRY_BODY.pack(*values, status)
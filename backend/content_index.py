@@ -0,0 +1,160 @@
+# backend/content_index.py
+
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+# Distinct grep patterns kept compiled
+PATTERN_CACHE_SIZE = int(os.getenv("AURORA_GREP_PATTERN_CACHE", "256"))
+# Longest line grep -E runs a regular expression over. A single search cannot
+# be interrupted, so this bounds how long one backtracking match can take.
+GREP_REGEX_MAX_LINE = int(os.getenv("AURORA_GREP_REGEX_MAX_LINE", "4096"))
+
+_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+
+# Characters indexed per call; each call holds the GIL throughout, so a huge
+# file is indexed in slices to keep the event loop and other workers running
+TRIGRAM_SLICE = 1 << 16
+
+def trigrams(text: str) -> FrozenSet[str]:
+    if len(text) <= TRIGRAM_SLICE:
+        return frozenset(map("".join, zip(text, text[1:], text[2:])))
+    grams: Set[str] = set()
+    for start in range(0, len(text) - 2, TRIGRAM_SLICE):
+        piece = text[start:start + TRIGRAM_SLICE + 2]
+        grams.update(map("".join, zip(piece, piece[1:], piece[2:])))
+    return frozenset(grams)
+
+class TrigramIndex:
+    # Trigram -> files containing it, over file contents. Writes only queue
+    # the file; it is (re)indexed on the next query, so a burst of writes to
+    # one file costs one indexing pass and restored files stay undecoded
+    # until something searches.
+    def __init__(self):
+        self.postings: Dict[str, Set[object]] = {}
+        self.indexed: Dict[object, FrozenSet[str]] = {}
+        self.pending: Set[object] = set()
+
+    def update(self, node):
+        self.pending.add(node)
+
+    def discard(self, node):
+        self.pending.discard(node)
+        self._unindex(node)
+
+    def _unindex(self, node):
+        for gram in self.indexed.pop(node, ()):
+            files = self.postings[gram]
+            files.discard(node)
+            if not files:
+                del self.postings[gram]
+
+    def refresh(self):
+        while self.pending:
+            node = self.pending.pop()
+            self._unindex(node)
+            grams = trigrams(node.text)
+            self.indexed[node] = grams
+            for gram in grams:
+                self.postings.setdefault(gram, set()).add(node)
+
+    def candidates(self, literals: Sequence[str]) -> Set[object]:
+        # Files containing every trigram of every required literal
+        self.refresh()
+        grams = sorted({gram for literal in literals for gram in trigrams(literal)},
+                       key=lambda gram: len(self.postings.get(gram, ())))
+        if not grams:
+            return set(self.indexed)
+        found = set(self.postings.get(grams[0], ()))
+        for gram in grams[1:]:
+            if not found:
+                break
+            found &= self.postings.get(gram, set())
+        return found
+
+def required_literals(pattern: str) -> List[str]:
+    # Literal runs every match of the regex must contain; empty when none can
+    # be proven (alternations, classes, case-insensitive parts, ...)
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    state = getattr(parsed, "state", None) or parsed.pattern
+    if state.flags & re.IGNORECASE:
+        return []
+    runs: List[str] = []
+    _collect_literals(parsed, runs)
+    return [run for run in runs if len(run) >= 3]
+
+def _collect_literals(items, runs: List[str]):
+    current: List[str] = []
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            current.append(chr(av))
+            continue
+        if current:
+            runs.append("".join(current))
+            current = []
+        if op is sre_constants.SUBPATTERN:
+            _, add_flags, _, body = av
+            if not add_flags & re.IGNORECASE:
+                _collect_literals(body, runs)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and av[0] >= 1:
+            _collect_literals(av[2], runs)
+    if current:
+        runs.append("".join(current))
+
+def nested_repeats(items, repeated: bool = False) -> bool:
+    # True when an unbounded repeat sits inside another, as in (a+)+ or
+    # (a*b?)*: the shapes whose backtracking grows exponentially
+    for op, av in items:
+        if op in _REPEATS:
+            unbounded = av[1] == sre_constants.MAXREPEAT
+            if (unbounded and repeated) or nested_repeats(av[2], repeated or unbounded):
+                return True
+        elif op is sre_constants.SUBPATTERN:
+            if nested_repeats(av[3], repeated):
+                return True
+        elif op is sre_constants.BRANCH:
+            if any(nested_repeats(branch, repeated) for branch in av[1]):
+                return True
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            if nested_repeats(av[1], repeated):
+                return True
+    return False
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def search_plan(pattern: str, regex: bool) -> Tuple[Callable[[str], bool], Tuple[str, ...]]:
+    # (line matcher, literals a matching file must contain); raises re.error,
+    # also from the matcher for a line longer than GREP_REGEX_MAX_LINE
+    if regex:
+        compiled = re.compile(pattern)
+        if nested_repeats(sre_parse.parse(pattern)):
+            raise re.error("nested unbounded repeats are not supported")
+
+        def matches(line: str) -> bool:
+            if len(line) > GREP_REGEX_MAX_LINE:
+                raise re.error(f"line longer than {GREP_REGEX_MAX_LINE} characters; use a fixed string")
+            return compiled.search(line) is not None
+
+        return matches, tuple(required_literals(pattern))
+    literals = (pattern,) if len(pattern) >= 3 else ()
+    return (lambda line: pattern in line), literals
+
+def content_candidates(vfs, literals: Sequence[str]) -> Optional[Set[object]]:
+    # Union over the filesystem's layers; None means every file is a candidate
+    if not literals:
+        return None
+    found: Set[object] = set()
+    while vfs is not None:
+        found |= vfs.index.candidates(literals)
+        vfs = vfs.base
+    return found
@@ -0,0 +1,181 @@
+# backend/delta.py
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .radar_engine import RadarTargetStore, format_target_ids, format_targets, target_keys
+
+# Smallest change worth sending per telemetry field, roughly the precision the
+# desktop displays. Fields not listed here are sent on any change.
+TELEMETRY_THRESHOLDS = {
+    "altitude": 1.0,
+    "speed": 0.005,
+    "fuel": 0.05,
+    "temperature": 0.5,
+    "g_force": 0.05,
+    "latitude": 0.00005,
+    "longitude": 0.00005,
+    "heading": 0.5,
+}
+
+class DeltaEncoder(ABC):
+    # Shared by every delta subscriber of one stream view. The encoder keeps
+    # the state clients have reconstructed so far (the baseline); each tick it
+    # emits only what moved past the thresholds and folds that into the
+    # baseline, so a keyframe is always consistent with the deltas after it.
+    #
+    # Every emitted frame gets the next sequence number. A keyframe carries the
+    # sequence number of the last frame folded into it, so a client expects
+    # `seq + 1` next and asks for a resync when it sees a gap.
+    def __init__(self, keyframe_interval: int = 30):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.seq = 0
+        self.ticks = 0
+
+    def encode(self) -> Tuple[bool, Optional[dict]]:
+        # Returns (keyframe_due, delta): on a periodic keyframe tick every
+        # subscriber gets a keyframe and delta is None; otherwise delta is None
+        # when nothing changed enough to be worth a frame.
+        self.ticks += 1
+        if self.ticks == 1 or self.ticks % self.keyframe_interval == 0:
+            self.reset()
+            self.seq += 1
+            return True, None
+        delta = self.diff()
+        if delta is None:
+            return False, None
+        self.seq += 1
+        delta["type"] = "delta"
+        delta["seq"] = self.seq
+        return False, delta
+
+    def keyframe(self) -> dict:
+        frame = self.snapshot()
+        frame["type"] = "keyframe"
+        frame["seq"] = self.seq
+        return frame
+
+    @abstractmethod
+    def reset(self):
+        ...
+
+    @abstractmethod
+    def diff(self) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def snapshot(self) -> dict:
+        ...
+
+class TelemetryDeltaEncoder(DeltaEncoder):
+    def __init__(self, simulation, keyframe_interval: int = 30, thresholds: Optional[Dict[str, float]] = None):
+        super().__init__(keyframe_interval)
+        self.simulation = simulation
+        self.thresholds = TELEMETRY_THRESHOLDS if thresholds is None else thresholds
+        self.baseline: Dict = {}
+
+    def reset(self):
+        self.baseline = dict(self.simulation.telemetry_snapshot())
+
+    def diff(self) -> Optional[dict]:
+        changed = {}
+        baseline = self.baseline
+        for key, value in self.simulation.telemetry_snapshot().items():
+            if key not in baseline:
+                changed[key] = value
+            elif isinstance(value, (int, float)) and isinstance(baseline[key], (int, float)):
+                if abs(value - baseline[key]) > self.thresholds.get(key, 0.0):
+                    changed[key] = value
+            elif value != baseline[key]:
+                changed[key] = value
+        if not changed:
+            return None
+        baseline.update(changed)
+        return {"changed": changed}
+
+    def snapshot(self) -> dict:
+        return {"data": dict(self.baseline)}
+
+class RadarDeltaEncoder(DeltaEncoder):
+    # Works directly on the target store columns. Store rows (and therefore
+    # viewport query results) keep spawn order, which lets the baseline and
+    # the current frame be matched by (type, id) key with array operations.
+    COLUMNS = ("ids", "type", "x", "y", "distance", "bearing")
+
+    def __init__(self, simulation, viewport=None, keyframe_interval: int = 30,
+                 position_threshold: float = 0.5, distance_threshold: float = 1.0,
+                 bearing_threshold: float = 1.0):
+        super().__init__(keyframe_interval)
+        self.simulation = simulation
+        self.viewport = viewport
+        self.position_threshold = position_threshold
+        self.distance_threshold = distance_threshold
+        self.bearing_threshold = bearing_threshold
+        self.baseline: Dict[str, np.ndarray] = {}
+
+    def _current(self) -> Dict[str, np.ndarray]:
+        store: RadarTargetStore = self.simulation.radar_targets
+        rows = self.simulation.radar_index.query_viewport(self.viewport)
+        if rows is None:
+            rows = slice(None, store.count)
+        # Fancy indexing copies; the slice case is copied so the baseline never aliases the store
+        return {name: np.array(getattr(store, "_" + name)[rows]) for name in self.COLUMNS}
+
+    def reset(self):
+        self.baseline = self._current()
+
+    def diff(self) -> Optional[dict]:
+        base = self.baseline
+        cur = self._current()
+        cur_keys = target_keys(cur["ids"], cur["type"])
+        base_keys = target_keys(base["ids"], base["type"])
+        in_base = np.isin(cur_keys, base_keys, assume_unique=True)
+        kept = np.isin(base_keys, cur_keys, assume_unique=True)
+        cur_idx = np.flatnonzero(in_base)
+        base_idx = np.flatnonzero(kept)
+
+        moved = (
+            (np.abs(cur["x"][cur_idx] - base["x"][base_idx]) > self.position_threshold)
+            | (np.abs(cur["y"][cur_idx] - base["y"][base_idx]) > self.position_threshold)
+            | (np.abs(cur["distance"][cur_idx] - base["distance"][base_idx]) > self.distance_threshold)
+            | (np.abs(np.mod(cur["bearing"][cur_idx] - base["bearing"][base_idx] + 180.0, 360.0) - 180.0)
+               > self.bearing_threshold)
+        )
+        added = np.flatnonzero(~in_base)
+        removed = np.flatnonzero(~kept)
+        moved_idx = cur_idx[moved]
+        if not (len(added) or len(removed) or len(moved_idx)):
+            return None
+
+        # New baseline: current ids, but targets that did not move past the
+        # thresholds keep the values clients already have
+        still = ~moved
+        for name in ("x", "y", "distance", "bearing"):
+            cur[name][cur_idx[still]] = base[name][base_idx[still]]
+        self.baseline = cur
+
+        return {
+            "added": format_targets(*(cur[name][added] for name in self.COLUMNS)),
+            "moved": [
+                {"id": target_id, "x": x, "y": y, "distance": d, "bearing": b}
+                for target_id, x, y, d, b in zip(
+                    format_target_ids(cur["ids"][moved_idx], cur["type"][moved_idx]),
+                    cur["x"][moved_idx].tolist(),
+                    cur["y"][moved_idx].tolist(),
+                    cur["distance"][moved_idx].tolist(),
+                    cur["bearing"][moved_idx].tolist(),
+                )
+            ],
+            "removed": format_target_ids(base["ids"][removed], base["type"][removed]),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    def snapshot(self) -> dict:
+        base = self.baseline
+        return {
+            "targets": format_targets(*(base[name] for name in self.COLUMNS)),
+            "timestamp": datetime.now().isoformat(),
+        }
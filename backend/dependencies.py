@@ -0,0 +1,107 @@
+# backend/dependencies.py
+
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, WebSocket, status
+from jose import JWTError
+from sqlalchemy import select
+
+from . import models
+from .auth import decode_access_token
+from .database import AsyncSessionLocal
+
+# Resolved user profiles kept in memory between requests
+USER_CACHE_SIZE = int(os.getenv("AURORA_USER_CACHE_SIZE", "1024"))
+# Seconds a cached profile is trusted before it is re-read from the database
+USER_CACHE_TTL = float(os.getenv("AURORA_USER_CACHE_TTL", "60"))
+
+class UserCache:
+    # LRU of user profiles (plain dicts, never ORM instances) with a TTL, so an
+    # authenticated request only touches the database on a miss. Nothing
+    # changes a user after creation yet; a role or active-flag change made
+    # directly in the database applies once the cached profile expires.
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Optional[dict]:
+        entry = self.entries.get(username)
+        if entry is None or entry[1] <= time.monotonic():
+            self.entries.pop(username, None)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(username)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, username: str, profile: dict):
+        self.entries[username] = (profile, time.monotonic() + self.ttl)
+        self.entries.move_to_end(username)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
+
+user_cache = UserCache()
+
+def user_profile(user: models.User) -> dict:
+    return {
+        "id": user.id,
+        "username": user.username,
+        "role": user.role,
+        "is_active": user.is_active,
+    }
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return token.strip()
+
+async def resolve_user(token: Optional[str]) -> Optional[dict]:
+    # Verified claims and the user profile both come from cache when warm
+    if not token:
+        return None
+    try:
+        claims = decode_access_token(token)
+    except JWTError:
+        return None
+    username = claims.get("sub")
+    if username is None:
+        return None
+    profile = user_cache.get(username)
+    if profile is None:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(models.User).where(models.User.username == username))
+            user = result.scalars().first()
+        if user is None:
+            return None
+        profile = user_profile(user)
+        user_cache.put(username, profile)
+    if not profile["is_active"]:
+        return None
+    return profile
+
+async def get_current_user(request: Request) -> dict:
+    # FastAPI dependency for authenticated HTTP endpoints
+    profile = await resolve_user(bearer_token(request.headers.get("Authorization")))
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return profile
+
+async def websocket_user(websocket: WebSocket) -> Optional[dict]:
+    # Browsers cannot set headers on a WebSocket handshake, so ?token= is
+    # accepted alongside the Authorization header
+    token = websocket.query_params.get("token") or bearer_token(websocket.headers.get("Authorization"))
+    return await resolve_user(token)
@@ -0,0 +1,116 @@
+# backend/event_feed.py
+
+import json
+import os
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from . import models, queries
+from .database import AsyncSessionLocal
+
+# Recent events kept per topic for cheap resume after a reconnect
+EVENT_FEED_HISTORY = int(os.getenv("AURORA_EVENT_FEED_HISTORY", "1000"))
+# Most rows replayed from the database for a client resuming from an old cursor
+EVENT_FEED_BACKFILL_LIMIT = int(os.getenv("AURORA_EVENT_FEED_BACKFILL", "1000"))
+
+# topic -> (model, base query, serializer)
+FEED_TOPICS = {
+    "logs": (models.Log, queries.logs_query, queries.serialize_log),
+    "system_events": (models.SystemEvent, queries.system_events_query, queries.serialize_system_event),
+}
+
+class FeedSubscription:
+    __slots__ = ("connection", "cursor", "ready", "pending")
+
+    def __init__(self, connection, cursor: int):
+        self.connection = connection
+        # Highest event id already delivered
+        self.cursor = cursor
+        # Live events that arrive while the backlog is still being replayed
+        self.ready = False
+        self.pending: List[dict] = []
+
+class EventFeed:
+    # In-process pub/sub for newly committed Log / SystemEvent rows. Rows are
+    # published after their transaction commits and pushed to every subscriber
+    # of the topic as {"topic", "events", "cursor"}; a client that reconnects
+    # with its last cursor gets the events it missed replayed first.
+    def __init__(self, history: int = EVENT_FEED_HISTORY):
+        self.recent: Dict[str, Deque[dict]] = {topic: deque(maxlen=history) for topic in FEED_TOPICS}
+        self.latest: Dict[str, int] = {topic: 0 for topic in FEED_TOPICS}
+        self.subscribers: Dict[str, Dict[object, FeedSubscription]] = {topic: {} for topic in FEED_TOPICS}
+
+    def topic_for(self, model) -> Optional[str]:
+        for topic, (topic_model, _, _) in FEED_TOPICS.items():
+            if topic_model is model:
+                return topic
+        return None
+
+    def load_rows(self, db, model, ids: List[int]) -> List[dict]:
+        # Runs on the writer's (sync) session right after commit
+        topic = self.topic_for(model)
+        _, query, serialize = FEED_TOPICS[topic]
+        rows = db.execute(query().where(model.id.in_(ids)).order_by(model.id)).all()
+        return [serialize(row) for row in rows]
+
+    async def publish(self, topic: str, events: List[dict]):
+        if not events:
+            return
+        events = sorted(events, key=lambda event: event["id"])
+        self.recent[topic].extend(events)
+        self.latest[topic] = max(self.latest[topic], events[-1]["id"])
+        # Subscribers that are caught up all get the same encoded message
+        shared = json.dumps({"topic": topic, "events": events, "cursor": events[-1]["id"]})
+        for subscription in list(self.subscribers[topic].values()):
+            if subscription.ready:
+                await self._deliver(topic, subscription, events, shared)
+            else:
+                subscription.pending.extend(events)
+
+    async def subscribe(self, connection, topic: str, after: Optional[int] = None):
+        # after=None: only events committed from now on
+        if topic not in FEED_TOPICS:
+            raise ValueError(f"unknown event topic: {topic}")
+        subscription = FeedSubscription(connection, self.latest[topic] if after is None else after)
+        self.subscribers[topic][connection] = subscription
+        if after is not None:
+            await self._deliver(topic, subscription, await self._backlog(topic, after))
+        # Swap pending out before each await: publish() may append while we deliver
+        while subscription.pending:
+            pending, subscription.pending = subscription.pending, []
+            await self._deliver(topic, subscription, pending)
+        subscription.ready = True
+
+    def unsubscribe(self, connection, topic: Optional[str] = None):
+        topics = FEED_TOPICS if topic is None else (topic,)
+        for name in topics:
+            self.subscribers.get(name, {}).pop(connection, None)
+
+    async def _backlog(self, topic: str, after: int) -> List[dict]:
+        recent = self.recent[topic]
+        if recent and recent[0]["id"] <= after + 1:
+            return [event for event in recent if event["id"] > after]
+        # Cursor is older than the in-memory window: replay from the database
+        model, query, serialize = FEED_TOPICS[topic]
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                query().where(model.id > after).order_by(model.id).limit(EVENT_FEED_BACKFILL_LIMIT)
+            )
+            return [serialize(row) for row in result.all()]
+
+    async def _deliver(self, topic: str, subscription: FeedSubscription, events: List[dict],
+                       shared: Optional[str] = None):
+        if not events:
+            return
+        if shared is not None and events[0]["id"] > subscription.cursor:
+            message = shared
+        else:
+            events = [event for event in events if event["id"] > subscription.cursor]
+            if not events:
+                return
+            message = json.dumps({"topic": topic, "events": events, "cursor": events[-1]["id"]})
+        subscription.cursor = events[-1]["id"]
+        if not await subscription.connection.send(message):
+            self.unsubscribe(subscription.connection, topic)
+
+event_feed = EventFeed()
@@ -0,0 +1,117 @@
+# backend/host_metrics.py
+
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two readings of /proc; the system stream ticks at this interval
+SYSTEM_SAMPLE_INTERVAL = float(os.getenv("AURORA_SYSTEM_SAMPLE_INTERVAL", "2"))
+PROC_ROOT = os.getenv("AURORA_PROC_ROOT", "/proc")
+# Interfaces left out of the network rate
+IGNORED_INTERFACES = ("lo",)
+
+def read_cpu_times(root: str = PROC_ROOT) -> Tuple[int, int]:
+    # (busy, total) jiffies summed over all CPUs from the aggregate "cpu" line;
+    # guest time is already included in user/nice, so only the first 8 fields count
+    with open(f"{root}/stat") as stat:
+        fields = [int(value) for value in stat.readline().split()[1:9]]
+    idle = fields[3] + fields[4]
+    total = sum(fields)
+    return total - idle, total
+
+def read_memory(root: str = PROC_ROOT) -> Tuple[int, int]:
+    # (total, available) in bytes
+    values: Dict[str, int] = {}
+    with open(f"{root}/meminfo") as meminfo:
+        for line in meminfo:
+            name, _, rest = line.partition(":")
+            if name in ("MemTotal", "MemAvailable", "MemFree"):
+                values[name] = int(rest.split()[0]) * 1024
+            if len(values) == 3:
+                break
+    total = values.get("MemTotal", 0)
+    return total, values.get("MemAvailable", values.get("MemFree", total))
+
+def read_network(root: str = PROC_ROOT) -> Tuple[int, int]:
+    # (received, transmitted) bytes over every interface but loopback
+    received = transmitted = 0
+    with open(f"{root}/net/dev") as dev:
+        for line in dev.readlines()[2:]:
+            interface, _, counters = line.partition(":")
+            if interface.strip() in IGNORED_INTERFACES:
+                continue
+            fields = counters.split()
+            received += int(fields[0])
+            transmitted += int(fields[8])
+    return received, transmitted
+
+def read_load(root: str = PROC_ROOT) -> float:
+    with open(f"{root}/loadavg") as loadavg:
+        return float(loadavg.read().split()[0])
+
+class HostMetrics:
+    # Reads the host's counters once per system stream tick and turns them
+    # into rates against the previous reading. The snapshot is shared, so
+    # the number of /proc reads does not depend on how many clients watch.
+    def __init__(self, root: str = PROC_ROOT):
+        self.root = root
+        self.cpus = os.cpu_count() or 1
+        self.previous: Optional[Tuple[float, Tuple[int, int], Tuple[int, int]]] = None
+        self.current = {
+            "cpu": 0.0,
+            "memory": 0.0,
+            "network": 0.0,
+            "timestamp": datetime.now().isoformat(),
+        }
+        self.samples = 0
+        self.failures = 0
+        self.sample()
+
+    def sample(self):
+        now = time.monotonic()
+        try:
+            cpu = read_cpu_times(self.root)
+            memory_total, memory_available = read_memory(self.root)
+            network = read_network(self.root)
+            load = read_load(self.root)
+        except (OSError, ValueError, IndexError):
+            # Not Linux, or /proc is hidden: keep the last values
+            if not self.failures:
+                logger.warning("cannot read host metrics from %s", self.root, exc_info=True)
+            self.failures += 1
+            return
+        snapshot = {
+            "cpu": 0.0,
+            "memory": 100.0 * (memory_total - memory_available) / memory_total if memory_total else 0.0,
+            "network": 0.0,
+            "network_rx": 0.0,
+            "network_tx": 0.0,
+            "memory_used": memory_total - memory_available,
+            "memory_total": memory_total,
+            "load": load,
+            "cpus": self.cpus,
+            "timestamp": datetime.now().isoformat(),
+        }
+        if self.previous is not None:
+            then, previous_cpu, previous_network = self.previous
+            busy, total = cpu[0] - previous_cpu[0], cpu[1] - previous_cpu[1]
+            if total > 0:
+                snapshot["cpu"] = 100.0 * busy / total
+            elapsed = now - then
+            if elapsed > 0:
+                # Mbit/s; counters that went backwards (interface reset) count as 0
+                rx = max(0, network[0] - previous_network[0]) * 8 / elapsed / 1e6
+                tx = max(0, network[1] - previous_network[1]) * 8 / elapsed / 1e6
+                snapshot.update(network=rx + tx, network_rx=rx, network_tx=tx)
+        self.previous = (now, cpu, network)
+        self.current = snapshot
+        self.samples += 1
+
+    def snapshot(self, view=None) -> dict:
+        return self.current
+
+host_metrics = HostMetrics()
@@ -0,0 +1,116 @@
+# backend/login_limiter.py
+
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+# Sliding window (seconds) the limits below are counted over
+LOGIN_WINDOW = float(os.getenv("AURORA_LOGIN_WINDOW", "300"))
+# Failed logins allowed per username inside the window
+LOGIN_MAX_USER_FAILURES = int(os.getenv("AURORA_LOGIN_MAX_USER_FAILURES", "5"))
+# Login attempts (successful or not) allowed per client address inside the window
+LOGIN_MAX_IP_ATTEMPTS = int(os.getenv("AURORA_LOGIN_MAX_IP_ATTEMPTS", "30"))
+# Usernames / addresses tracked at once; the least recently seen are forgotten first
+LOGIN_TRACKED_KEYS = int(os.getenv("AURORA_LOGIN_TRACKED_KEYS", "10000"))
+
+class SlidingWindow:
+    # Timestamps of recent events per key; a key is over its limit while
+    # `limit` events fall inside the trailing window
+    def __init__(self, limit: int, window: float, max_keys: int):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.events: "OrderedDict[str, Deque[float]]" = OrderedDict()
+
+    def _recent(self, key: str, now: float) -> Optional[Deque[float]]:
+        events = self.events.get(key)
+        if events is None:
+            return None
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if not events:
+            del self.events[key]
+            return None
+        return events
+
+    def retry_after(self, key: str, now: float) -> float:
+        # Seconds until the key drops back under its limit (0 when it is under)
+        events = self._recent(key, now)
+        if events is None or len(events) < self.limit:
+            return 0.0
+        return events[-self.limit] + self.window - now
+
+    def hit(self, key: str, now: float):
+        events = self._recent(key, now)
+        if events is None:
+            events = self.events[key] = deque(maxlen=self.limit)
+        events.append(now)
+        self.events.move_to_end(key)
+        while len(self.events) > self.max_keys:
+            self.events.popitem(last=False)
+
+    def reset(self, key: str):
+        self.events.pop(key, None)
+
+class LoginLimiter:
+    # Checked before any password work, so a login storm is turned away with
+    # 429 instead of queueing bcrypt jobs. Failures count per username and
+    # every attempt counts per client address. State is in memory and seeded
+    # from recent LoginAttempt rows at startup so a restart does not reset it.
+    def __init__(self, window: float = LOGIN_WINDOW, max_user_failures: int = LOGIN_MAX_USER_FAILURES,
+                 max_ip_attempts: int = LOGIN_MAX_IP_ATTEMPTS, max_keys: int = LOGIN_TRACKED_KEYS):
+        self.window = window
+        self.user_failures = SlidingWindow(max_user_failures, window, max_keys)
+        self.ip_attempts = SlidingWindow(max_ip_attempts, window, max_keys)
+        self.throttled = 0
+
+    def retry_after(self, username: str, ip_address: str, now: Optional[float] = None) -> int:
+        # Whole seconds to wait before trying again; 0 means go ahead
+        now = time.time() if now is None else now
+        wait = max(self.user_failures.retry_after(username, now), self.ip_attempts.retry_after(ip_address, now))
+        if wait > 0:
+            self.throttled += 1
+        return math.ceil(wait)
+
+    def record(self, username: str, ip_address: str, success: bool, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self.ip_attempts.hit(ip_address, now)
+        if success:
+            self.user_failures.reset(username)
+        else:
+            self.user_failures.hit(username, now)
+
+    async def load(self, db: AsyncSession):
+        since = datetime.now(timezone.utc).timestamp() - self.window
+        result = await db.execute(
+            select(
+                models.LoginAttempt.username,
+                models.LoginAttempt.ip_address,
+                models.LoginAttempt.success,
+                models.LoginAttempt.created_at,
+            )
+            .where(models.LoginAttempt.created_at >= datetime.fromtimestamp(since, timezone.utc))
+            .order_by(models.LoginAttempt.created_at, models.LoginAttempt.id)
+        )
+        for username, ip_address, success, created_at in result.all():
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            self.record(username or "", ip_address or "", bool(success), created_at.timestamp())
+
+    def stats(self) -> Dict:
+        return {
+            "window": self.window,
+            "tracked_users": len(self.user_failures.events),
+            "tracked_addresses": len(self.ip_attempts.events),
+            "throttled": self.throttled,
+        }
+
+login_limiter = LoginLimiter()
@@ -1,15 +1,33 @@
-from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, Request
+from fastapi import FastAPI, Depends, HTTPException, Query, status, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
+import asyncio
+import json
 import os
+import random
+import time
+import uuid
 from pathlib import Path
+from typing import Optional
 
-from . import models, auth, websocket, terminal_engine
-from .database import get_db, engine
-from .auth import create_access_token, authenticate_user, create_default_users, ACCESS_TOKEN_EXPIRE_MINUTES
+from . import models, auth, websocket, terminal_engine, queries
+from .database import get_async_db, engine, upgrade_schema, AsyncSessionLocal
+from .audit import audit_writer
+from .event_feed import event_feed
+from .dependencies import get_current_user, user_cache, websocket_user
+from .login_limiter import login_limiter
+from .terminal_snapshots import terminal_snapshots
+from .terminal_runner import TerminalSession, terminal_runner
+from .terminal_sessions import terminal_sessions
+from .multiplex import MUX_SEND_QUEUE_SIZE, multiplexer, parse_topics
+from .websocket import manager, simulation, shared_simulation, radar_stream, telemetry_stream, system_stream, BLOCK, DISCONNECT, DROP_OLDEST, STREAM_FORMATS, TERMINAL_SEND_QUEUE_SIZE
+from .radar_engine import Viewport
+from .binary_frames import BINARY_SUBPROTOCOL
+from .auth import create_access_token, authenticate_user, create_default_users, password_hasher, PasswordHasherBusy, ACCESS_TOKEN_EXPIRE_MINUTES
 
 app = FastAPI(title="AURORA-X OPERATING SYSTEM", version="3.9.0")
 
@@ -28,46 +46,87 @@ static_dir.mkdir(exist_ok=True)
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 # Initialize database
+upgrade_schema(engine, models.Base.metadata)
 models.Base.metadata.create_all(bind=engine)
 
 # Create default users on startup
 @app.on_event("startup")
 async def startup_event():
-    db = next(get_db())
-    auth.create_default_users(db)
+    async with AsyncSessionLocal() as db:
+        await create_default_users(db)
+        await login_limiter.load(db)
+    audit_writer.start()
+    terminal_snapshots.start()
+    terminal_sessions.start()
+    if shared_simulation is not None:
+        # One worker becomes the owner; the others attach to its buffer
+        shared_simulation.start()
+    radar_stream.start()
+    telemetry_stream.start()
+    system_stream.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await radar_stream.stop()
+    await telemetry_stream.stop()
+    await system_stream.stop()
+    if shared_simulation is not None:
+        shared_simulation.stop()
+    await terminal_sessions.stop()
+    await terminal_snapshots.stop()
+    terminal_runner.shutdown()
+    # Commit every audit event still queued
+    await audit_writer.stop()
+    password_hasher.shutdown()
 
 # Authentication endpoints
 @app.post("/api/login")
-async def login(request: Request, db: Session = Depends(get_db)):
+async def login(request: Request, db: AsyncSession = Depends(get_async_db)):
     data = await request.json()
-    username = data.get("username")
-    password = data.get("password")
+    username = data.get("username") or ""
+    password = data.get("password") or ""
+    client_ip = request.client.host if request.client else "unknown"
+    
+    # Throttled before any bcrypt work is queued
+    retry_after = login_limiter.retry_after(username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(retry_after)},
+        )
+    
+    try:
+        user = await authenticate_user(db, username, password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Login service busy",
+            headers={"Retry-After": "1"},
+        )
+    login_limiter.record(username, client_ip, success=user is not None)
     
-    user = authenticate_user(db, username, password)
+    # Log login attempt and system log (written behind by the audit writer)
+    await audit_writer.record(
+        models.LoginAttempt,
+        username=username,
+        user_id=user.id if user else None,
+        ip_address=client_ip,
+        success=user is not None
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    # Log login attempt
-    login_attempt = models.LoginAttempt(
-        user_id=user.id,
-        ip_address=request.client.host,
-        success=True
-    )
-    db.add(login_attempt)
-    
-    # Create system log
-    log = models.Log(
+    await audit_writer.record(
+        models.Log,
         user_id=user.id,
         event_type="login",
         description=f"User {username} logged in successfully",
         severity="info"
     )
-    db.add(log)
-    db.commit()
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -83,142 +142,337 @@ async def login(request: Request, db: Session = Depends(get_db)):
     }
 
 @app.get("/api/user")
-async def get_current_user(request: Request, db: Session = Depends(get_db)):
-    token = request.headers.get("Authorization", "").replace("Bearer ", "")
-    if not token:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    try:
-        from jose import jwt
-        from .auth import SECRET_KEY, ALGORITHM
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
-    
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
-    
+async def read_current_user(user: dict = Depends(get_current_user)):
     return {
-        "username": user.username,
-        "role": user.role,
-        "full_name": user.full_name
+        "username": user["username"],
+        "role": user["role"]
     }
 
 # WebSocket endpoints
 @app.websocket("/ws/terminal/{session_id}")
 async def websocket_terminal(websocket: WebSocket, session_id: str):
-    await websocket.manager.connect(websocket, session_id)
-    
-    # Initialize terminal session
-    terminal = terminal_engine.TerminalEngine()
-    websocket.manager.terminal_sessions[session_id] = {
-        "terminal": terminal,
-        "websocket": websocket
-    }
+    # A session only ever reopens for the user who created it
+    user = await websocket_user(websocket)
+    try:
+        if user is None:
+            raise PermissionError("not authenticated")
+        await terminal_sessions.close(session_id, user)
+        # Resume the session's snapshot when this is a reconnect
+        terminal = await terminal_snapshots.restore(session_id, user["username"]) or terminal_engine.TerminalEngine()
+    except PermissionError:
+        # Accepted first so the client sees the close code instead of a failed handshake
+        await websocket.accept()
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    # Terminal output must not be dropped, so a full queue blocks the session instead
+    # Registered under a random id, like every other socket, so the session id never shows in stats
+    client_id = f"terminal:{uuid.uuid4().hex}"
+    connection = await manager.connect(websocket, client_id, policy=BLOCK, max_queue=TERMINAL_SEND_QUEUE_SIZE)
+    managed = await terminal_sessions.open(session_id, terminal, connection, user)
+    terminal_snapshots.track(session_id, terminal, user["username"])
     
+    # Commands run on the terminal worker pool; the reader only reads the
+    # socket, so Ctrl-C is seen while a command is still running
+    session = TerminalSession(terminal, connection.send)
+    managed.task = asyncio.create_task(read_terminal(websocket, connection, session, managed))
     try:
-        while True:
-            data = await websocket.receive_text()
-            result = terminal.execute(data)
-            prompt = terminal.get_prompt()
-            await websocket.send_text(f"{result}\n{prompt}")
+        # The session manager cancels the reader to evict the session
+        await asyncio.wait([managed.task])
+        if not managed.task.cancelled():
+            managed.task.result()
+    finally:
+        managed.task.cancel()
+        # Shielded: the cleanup runs to the end even when this handler is
+        # cancelled, since the session's next socket waits for it
+        await asyncio.shield(asyncio.ensure_future(close_terminal(session, client_id, managed)))
+
+async def close_terminal(session: TerminalSession, client_id: str, managed):
+    try:
+        await session.close()
+        manager.disconnect(client_id)
+        await terminal_snapshots.release(managed.session_id, managed.engine)
+    finally:
+        terminal_sessions.remove(managed)
+
+async def read_terminal(websocket: WebSocket, connection, session: TerminalSession, managed):
+    try:
+        while not connection.closed:
+            message = await websocket.receive_text()
+            terminal_sessions.touch(managed)
+            await session.receive(message)
     except WebSocketDisconnect:
-        websocket.manager.disconnect(session_id)
+        pass
 
-@app.websocket("/ws/radar")
-async def websocket_radar(websocket: WebSocket):
-    await websocket.accept()
+def negotiate_format(websocket: WebSocket):
+    # Binary frames are opted into with the aurora.bin.v1 subprotocol or
+    # ?format=binary. The subprotocol is echoed back when requested; a browser
+    # fails the handshake when it is not, so there is no JSON fallback on a
+    # server without it, and such clients should use ?format=binary instead.
+    if BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+        return "binary", BINARY_SUBPROTOCOL
+    return websocket.query_params.get("format", "json"), None
+
+async def serve_stream(websocket: WebSocket, stream, view=None, parse_view=None):
+    # Frames are pushed by the shared stream tick through the connection's send
+    # queue; this loop only handles client control messages until the client leaves:
+    #   {"resync": true}      -> next frame is a keyframe (delta mode)
+    #   {"viewport": {...}}   -> change the view (streams with parse_view)
+    format, subprotocol = negotiate_format(websocket)
+    client_id = f"{stream.name}:{uuid.uuid4().hex}"
+    connection = await manager.connect(websocket, client_id, policy=DROP_OLDEST, subprotocol=subprotocol)
+    try:
+        stream.subscribe(connection, view, websocket.query_params.get("mode", "full"), format)
+    except ValueError:
+        manager.disconnect(client_id)
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
     try:
         while True:
-            import asyncio
-            radar_data = websocket.simulation.get_radar_data()
-            await websocket.send_json(radar_data)
-            await asyncio.sleep(1)
+            message = await websocket.receive_text()
+            try:
+                data = json.loads(message)
+                if not isinstance(data, dict):
+                    continue
+                if data.get("resync"):
+                    stream.request_resync(connection)
+                if parse_view is not None and "viewport" in data:
+                    stream.set_view(connection, parse_view(data["viewport"] or {}))
+            except (ValueError, TypeError, AttributeError):
+                continue
     except WebSocketDisconnect:
         pass
+    finally:
+        stream.unsubscribe(connection)
+        manager.disconnect(client_id)
+
+@app.websocket("/ws/radar")
+async def websocket_radar(websocket: WebSocket):
+    # Optional viewport: ?range=&cx=&cy=&sector_start=&sector_width=
+    # Optional delta mode: ?mode=delta, or binary full frames (see negotiate_format)
+    try:
+        viewport = Viewport.from_mapping(websocket.query_params)
+    except ValueError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await serve_stream(websocket, radar_stream, viewport, Viewport.from_mapping)
 
 @app.websocket("/ws/telemetry")
 async def websocket_telemetry(websocket: WebSocket):
-    await websocket.accept()
+    await serve_stream(websocket, telemetry_stream)
+
+def parse_cursor(value) -> Optional[int]:
+    return None if value in (None, "") else int(value)
+
+@app.websocket("/ws/events")
+async def websocket_events(websocket: WebSocket):
+    # Push feed of new Log / SystemEvent rows. Subscribe with ?topic=&after=<id>
+    # or {"subscribe": topic, "after": id}; `after` resumes from the last cursor
+    # received, so nothing is missed across reconnects. A client that falls
+    # behind is disconnected and simply resumes.
+    client_id = f"events:{uuid.uuid4().hex}"
+    connection = await manager.connect(websocket, client_id, policy=DISCONNECT)
     try:
+        topic = websocket.query_params.get("topic")
+        if topic:
+            await event_feed.subscribe(connection, topic, parse_cursor(websocket.query_params.get("after")))
         while True:
-            import asyncio
-            telemetry_data = websocket.simulation.get_telemetry_data()
-            await websocket.send_json(telemetry_data)
-            await asyncio.sleep(0.5)
+            message = await websocket.receive_text()
+            try:
+                data = json.loads(message)
+                if not isinstance(data, dict):
+                    continue
+                if data.get("subscribe"):
+                    await event_feed.subscribe(connection, data["subscribe"], parse_cursor(data.get("after")))
+                if data.get("unsubscribe"):
+                    event_feed.unsubscribe(connection, data["unsubscribe"])
+            except (ValueError, TypeError):
+                continue
+    except ValueError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
     except WebSocketDisconnect:
         pass
+    finally:
+        event_feed.unsubscribe(connection)
+        manager.disconnect(client_id)
 
 @app.websocket("/ws/system")
 async def websocket_system(websocket: WebSocket):
-    await websocket.accept()
+    await serve_stream(websocket, system_stream)
+
+@app.websocket("/ws")
+async def websocket_multiplex(websocket: WebSocket):
+    # Every desktop stream over one socket. Subscribe with
+    # ?topics=system,telemetry:2,radar:1 (topic[:updates per second]) or
+    #   {"subscribe": topic, "rate": hz, "viewport": {...}, "after": cursor}
+    #   {"unsubscribe": topic}
+    # Frames are {"seq": n, "topics": {topic: payload, ...}}; updates that
+    # land in the same tick share one frame (see MultiplexSession). With the
+    # binary format (see negotiate_format) radar comes as binary messages.
+    format, subprotocol = negotiate_format(websocket)
+    if format not in STREAM_FORMATS:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    client_id = f"mux:{uuid.uuid4().hex}"
+    connection = await manager.connect(websocket, client_id, policy=BLOCK, max_queue=MUX_SEND_QUEUE_SIZE,
+                                       subprotocol=subprotocol)
+    session = multiplexer.open(connection, format)
     try:
+        for topic, rate in parse_topics(websocket.query_params.get("topics", "")):
+            await session.subscribe(topic, rate, websocket.query_params)
         while True:
-            import asyncio
-            system_data = {
-                "cpu": random.uniform(10, 40),
-                "memory": random.uniform(30, 70),
-                "network": random.uniform(5, 50),
-                "timestamp": datetime.now().isoformat()
-            }
-            await websocket.send_json(system_data)
-            await asyncio.sleep(2)
+            message = await websocket.receive_text()
+            try:
+                data = json.loads(message)
+                if not isinstance(data, dict):
+                    continue
+                if data.get("subscribe"):
+                    await session.subscribe(data["subscribe"], data.get("rate"), data.get("viewport"),
+                                            parse_cursor(data.get("after")))
+                if data.get("unsubscribe"):
+                    session.unsubscribe(data["unsubscribe"])
+            except (ValueError, TypeError, AttributeError):
+                continue
+    except ValueError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
     except WebSocketDisconnect:
         pass
+    finally:
+        await multiplexer.close(session)
+        manager.disconnect(client_id)
 
 # API endpoints for weapons and logs
 @app.post("/api/weapons/fire")
-async def fire_weapon(request: Request, db: Session = Depends(get_db)):
+async def fire_weapon(request: Request, user: dict = Depends(get_current_user)):
     data = await request.json()
     weapon_type = data.get("type")
     target = data.get("target")
     
     # Log weapon activity
-    weapon_activity = models.WeaponActivity(
-        user_id=1,  # Would come from JWT in production
+    await audit_writer.record(
+        models.WeaponsActivity,
+        user_id=user["id"],
         weapon_type=weapon_type,
         action="fire",
         target=target,
         coordinates=f"{random.uniform(-90, 90):.4f}, {random.uniform(-180, 180):.4f}"
     )
-    db.add(weapon_activity)
-    db.commit()
     
     return {"status": "success", "message": f"{weapon_type} fired at {target}"}
 
+@app.get("/api/system/connections")
+async def get_connection_stats(user: dict = Depends(get_current_user)):
+    # Per-connection send queue depth and dropped-frame counters
+    return manager.stats()
+
+@app.get("/api/system/simulation")
+async def get_simulation_stats(user: dict = Depends(get_current_user)):
+    # Which process owns the simulation in shared mode, and the ticks this one has seen
+    if shared_simulation is None:
+        return {"mode": "local", "radar_tick": radar_stream.tick, "telemetry_tick": telemetry_stream.tick}
+    return shared_simulation.stats()
+
+@app.get("/api/system/multiplex")
+async def get_multiplex_stats(user: dict = Depends(get_current_user)):
+    # Topics, rates and coalesced updates of each multiplexed socket (not which client it is)
+    return multiplexer.stats()
+
+@app.get("/api/system/audit")
+async def get_audit_stats(user: dict = Depends(get_current_user)):
+    return audit_writer.stats()
+
+# Telemetry history for chart backfill
+MAX_HISTORY_POINTS = 5000
+
+@app.get("/api/telemetry/history")
+async def get_telemetry_history(
+    start: Optional[float] = Query(None, alias="from"),
+    end: Optional[float] = Query(None, alias="to"),
+    points: int = Query(500, ge=1, le=MAX_HISTORY_POINTS),
+    fields: Optional[str] = None,
+):
+    # from/to are unix timestamps in seconds; defaults cover everything kept
+    if end is None:
+        end = time.time()
+    if start is None:
+        start = 0.0
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    names = fields.split(",") if fields else None
+    return simulation.telemetry_history.query(start, end, points, names)
+
+@app.get("/api/system/auth")
+async def get_auth_cache_stats(user: dict = Depends(get_current_user)):
+    return {
+        "tokens": auth.token_cache.stats(),
+        "users": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "login_limiter": login_limiter.stats(),
+    }
+
+@app.get("/api/system/terminals")
+async def get_terminal_stats(user: dict = Depends(get_current_user)):
+    # Open terminal sessions, most recently used first, with memory estimates;
+    # session ids stay private to their owners
+    return {
+        **terminal_sessions.stats(),
+        "runner": terminal_runner.stats(),
+        "snapshots": terminal_snapshots.stats(),
+        "active": terminal_sessions.describe(),
+    }
+
+# Log and system event listings are keyset-paginated: pass the last id of a
+# page as ?before= to get the next one (also returned in X-Next-Before)
+MAX_PAGE_SIZE = 1000
+
+def set_next_cursor(response: Response, rows, limit: int):
+    if len(rows) == limit:
+        response.headers["X-Next-Before"] = str(rows[-1].id)
+
 @app.get("/api/logs")
-async def get_logs(db: Session = Depends(get_db)):
-    logs = db.query(models.Log).order_by(models.Log.created_at.desc()).limit(100).all()
-    return [
-        {
-            "id": log.id,
-            "user": log.user.username if log.user else "system",
-            "event_type": log.event_type,
-            "description": log.description,
-            "severity": log.severity,
-            "timestamp": log.created_at.isoformat()
-        }
-        for log in logs
-    ]
+async def get_logs(
+    response: Response,
+    before: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    severity: Optional[str] = None,
+    event_type: Optional[str] = None,
+    user: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    stmt = queries.logs_query(severity, event_type, user)
+    rows = await queries.fetch_page(db, stmt, models.Log, before, limit)
+    set_next_cursor(response, rows, limit)
+    return [queries.serialize_log(row) for row in rows]
+
+@app.get("/api/logs/export")
+async def export_logs(severity: Optional[str] = None, event_type: Optional[str] = None, user: Optional[str] = None):
+    stmt = queries.logs_query(severity, event_type, user)
+    return StreamingResponse(
+        queries.export_ndjson(stmt, models.Log, queries.serialize_log),
+        media_type="application/x-ndjson"
+    )
 
 @app.get("/api/system/events")
-async def get_system_events(db: Session = Depends(get_db)):
-    events = db.query(models.SystemEvent).order_by(models.SystemEvent.created_at.desc()).limit(50).all()
-    return [
-        {
-            "id": event.id,
-            "event_type": event.event_type,
-            "component": event.component,
-            "message": event.message,
-            "status": event.status,
-            "timestamp": event.created_at.isoformat()
-        }
-        for event in events
-    ]
+async def get_system_events(
+    response: Response,
+    before: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    severity: Optional[str] = None,
+    event_type: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    stmt = queries.system_events_query(severity, event_type)
+    rows = await queries.fetch_page(db, stmt, models.SystemEvent, before, limit)
+    set_next_cursor(response, rows, limit)
+    return [queries.serialize_system_event(row) for row in rows]
+
+@app.get("/api/system/events/export")
+async def export_system_events(severity: Optional[str] = None, event_type: Optional[str] = None):
+    stmt = queries.system_events_query(severity, event_type)
+    return StreamingResponse(
+        queries.export_ndjson(stmt, models.SystemEvent, queries.serialize_system_event),
+        media_type="application/x-ndjson"
+    )
 
 # Frontend routes
 @app.get("/")
@@ -1,6 +1,6 @@
 # backend/models.py
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Float, Index
 from sqlalchemy.sql import func
 from database import Base
 
@@ -18,20 +18,38 @@ class Log(Base):
     __tablename__ = "logs"
 
     id = Column(Integer, primary_key=True, index=True)
-    event = Column(String)
+    # Stored under the original column names, so existing databases keep working
+    event_type = Column("event", String)
     user_id = Column(Integer)
-    details = Column(Text)
+    description = Column("details", Text)
+    severity = Column(String)  # info, warning, error, critical
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Keyset pagination runs newest first on (created_at, id); the filter
+    # indexes end in the same columns so filtered pages stay index-ordered
+    __table_args__ = (
+        Index("ix_logs_created_at_id", "created_at", "id"),
+        Index("ix_logs_severity_created_at_id", "severity", "created_at", "id"),
+        Index("ix_logs_event_created_at_id", "event", "created_at", "id"),
+        Index("ix_logs_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
 class SystemEvent(Base):
     __tablename__ = "system_events"
 
     id = Column(Integer, primary_key=True, index=True)
     event_type = Column(String)
+    component = Column(String)
     severity = Column(String)  # info, warning, error, critical
     message = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_system_events_created_at_id", "created_at", "id"),
+        Index("ix_system_events_severity_created_at_id", "severity", "created_at", "id"),
+        Index("ix_system_events_event_type_created_at_id", "event_type", "created_at", "id"),
+    )
+
 class WeaponsActivity(Base):
     __tablename__ = "weapons_activity"
 
@@ -39,6 +57,8 @@ class WeaponsActivity(Base):
     user_id = Column(Integer)
     weapon_type = Column(String)
     action = Column(String)  # launch, activate, etc.
+    target = Column(String)
+    coordinates = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class LoginAttempt(Base):
@@ -46,6 +66,7 @@ class LoginAttempt(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String)
+    user_id = Column(Integer)
     ip_address = Column(String)
     success = Column(Boolean)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
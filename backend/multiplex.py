@@ -0,0 +1,229 @@
+# backend/multiplex.py
+
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from .event_feed import FEED_TOPICS, event_feed
+from .radar_engine import Viewport
+from .websocket import AdaptiveRate, ClientConnection, WS_CLOSE_LAGGING, radar_stream, system_stream, telemetry_stream
+
+# Seconds updates are gathered before a frame goes out, so streams ticking
+# together share one frame
+MUX_WINDOW = float(os.getenv("AURORA_MUX_WINDOW", "0.05"))
+# Frames queued per socket; while it is full, newer stream updates replace the unsent ones
+MUX_SEND_QUEUE_SIZE = int(os.getenv("AURORA_MUX_SEND_QUEUE_SIZE", "4"))
+# Event-feed messages held for a socket before it is closed (the client resumes from its cursor)
+MUX_MAX_PENDING_EVENTS = int(os.getenv("AURORA_MUX_MAX_PENDING_EVENTS", "256"))
+
+# Topics carrying the latest state; only the newest update is ever sent
+STREAM_TOPICS = {
+    "system": system_stream,
+    "telemetry": telemetry_stream,
+    "radar": radar_stream,
+}
+# Topics carrying change-feed events; every message is sent, in order
+EVENT_TOPICS = tuple(FEED_TOPICS)
+TOPICS = tuple(STREAM_TOPICS) + EVENT_TOPICS
+# Topics sent as binary frames (see binary_frames.py) when the socket negotiated
+# the binary format; they go out as their own messages, next to the JSON frame
+BINARY_TOPICS = ("radar",)
+
+def parse_topics(value: str) -> List[Tuple[str, Optional[float]]]:
+    # "system,telemetry:2,radar:1" -> [(topic, rate in Hz or None)]
+    topics = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        topic, _, rate = item.partition(":")
+        topics.append((topic, float(rate) if rate else None))
+    return topics
+
+class TopicSink:
+    # Stands in for a ClientConnection in a stream's or the event feed's
+    # subscriber table and hands each message to its multiplexed session
+    __slots__ = ("session", "topic", "interval", "next_due")
+
+    def __init__(self, session: "MultiplexSession", topic: str, interval: float):
+        self.session = session
+        self.topic = topic
+        # Minimum seconds between two frames carrying this topic
+        self.interval = interval
+        self.next_due = 0.0
+
+    async def send(self, message: Union[str, bytes]) -> bool:
+        return await self.session.offer(self, message)
+
+class MultiplexSession:
+    # All of one client's topics over a single socket. Stream updates are
+    # only recorded as the topic's latest message; a writer task sends every
+    # topic that is due at the requested rate in one tagged frame:
+    #   {"seq": n, "topics": {"telemetry": {...}, "radar": {...}, "logs": [{...}, ...]}}
+    # A slow client therefore receives fewer, fresher frames instead of a
+    # backlog, and while its send latency or queue builds up every stream
+    # topic's interval is stretched further (see AdaptiveRate). "ts" is the
+    # server's monotonic clock when the frame was sent; stream payloads carry
+    # the "ts" of their own tick. In the binary format, BINARY_TOPICS updates
+    # are sent as binary messages instead of inside the tagged frame.
+    def __init__(self, connection: ClientConnection, format: str = "json", window: float = MUX_WINDOW,
+                 max_pending_events: int = MUX_MAX_PENDING_EVENTS):
+        self.connection = connection
+        self.format = format
+        self.window = window
+        self.max_pending_events = max_pending_events
+        self.sinks: Dict[str, TopicSink] = {}
+        self.latest: Dict[str, Union[str, bytes]] = {}
+        self.events: Dict[str, List[str]] = {}
+        self.pace = AdaptiveRate()
+        self.seq = 0
+        self.updates = 0
+        self.coalesced = 0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def subscribe(self, topic: str, rate: Optional[float] = None, viewport: Optional[dict] = None,
+                        after: Optional[int] = None):
+        # Subscribing again to a topic changes its rate, viewport or cursor.
+        # rate (updates per second, None for every tick) applies to stream
+        # topics; event topics are sent as soon as they arrive
+        if topic not in TOPICS:
+            raise ValueError(f"unknown topic: {topic}")
+        if rate is not None and not rate > 0:
+            raise ValueError(f"invalid rate for {topic}: {rate}")
+        sink = self.sinks.get(topic)
+        if sink is None:
+            sink = self.sinks[topic] = TopicSink(self, topic, 0.0)
+        sink.interval = 1.0 / rate if rate else 0.0
+        if topic in EVENT_TOPICS:
+            await event_feed.subscribe(sink, topic, after)
+            return
+        stream = STREAM_TOPICS[topic]
+        view = Viewport.from_mapping(viewport or {}) if topic == "radar" else None
+        if sink in stream.subscribers:
+            stream.set_view(sink, view)
+        else:
+            stream.subscribe(sink, view, format=self.format if topic in BINARY_TOPICS else "json")
+
+    def unsubscribe(self, topic: str):
+        sink = self.sinks.pop(topic, None)
+        if sink is None:
+            return
+        if topic in EVENT_TOPICS:
+            event_feed.unsubscribe(sink, topic)
+        else:
+            STREAM_TOPICS[topic].unsubscribe(sink)
+        self.latest.pop(topic, None)
+        self.events.pop(topic, None)
+
+    async def close(self):
+        for topic in list(self.sinks):
+            self.unsubscribe(topic)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def offer(self, sink: TopicSink, message: Union[str, bytes]) -> bool:
+        # Called by the stream ticks and the event feed; never waits on the socket
+        if self.connection.closed or self.sinks.get(sink.topic) is not sink:
+            return False
+        self.updates += 1
+        if sink.topic in EVENT_TOPICS:
+            pending = self.events.setdefault(sink.topic, [])
+            if len(pending) >= self.max_pending_events:
+                await self.connection.close(WS_CLOSE_LAGGING)
+                return False
+            pending.append(message)
+        else:
+            if sink.topic in self.latest:
+                self.coalesced += 1
+            self.latest[sink.topic] = message
+        self._wake.set()
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            await asyncio.sleep(self.window)
+            while self.latest or self.events:
+                now = loop.time()
+                topics, wait = self._due(now)
+                if topics:
+                    binary = [topics.pop(topic) for topic in BINARY_TOPICS if isinstance(topics.get(topic), bytes)]
+                    if topics and not await self.connection.send(self._frame(topics)):
+                        return
+                    for message in binary:
+                        if not await self.connection.send(message):
+                            return
+                    continue
+                # Only topics held back by their rate are left
+                try:
+                    await asyncio.wait_for(self._wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    def _due(self, now: float) -> Tuple[Dict[str, Union[str, bytes]], float]:
+        # (topic -> encoded payload for the next frame, seconds until the
+        # earliest held-back topic is due)
+        topics = {topic: "[" + ",".join(messages) + "]" for topic, messages in self.events.items()}
+        self.events = {}
+        factor = self.pace.update(self.connection, now)
+        wait = None
+        for topic, message in list(self.latest.items()):
+            sink = self.sinks[topic]
+            # Updates landing within the gathering window of their due time count as due
+            if sink.next_due - self.window <= now:
+                topics[topic] = message
+                del self.latest[topic]
+                interval = max(sink.interval, STREAM_TOPICS[topic].interval) * factor
+                # Keeps the cadence unless the topic was idle longer than an interval
+                sink.next_due = (sink.next_due if now - sink.next_due < interval else now) + interval
+            else:
+                wait = sink.next_due - now if wait is None else min(wait, sink.next_due - now)
+        return topics, wait or 0.0
+
+    def _frame(self, topics: Dict[str, str]) -> str:
+        # Payloads are already JSON (shared by every subscriber of the stream),
+        # so the frame is assembled around them rather than re-encoded
+        self.seq += 1
+        body = ",".join(f"{json.dumps(topic)}:{payload}" for topic, payload in topics.items())
+        return f'{{"seq":{self.seq},"ts":{time.monotonic():.3f},"topics":{{{body}}}}}'
+
+    def stats(self) -> dict:
+        return {
+            "topics": {topic: (round(1.0 / sink.interval, 3) if sink.interval else None)
+                       for topic, sink in self.sinks.items()},
+            "pace": self.pace.factor,
+            "latency_ms": round(self.connection.latency * 1000, 1),
+            "frames": self.seq,
+            "updates": self.updates,
+            "coalesced": self.coalesced,
+        }
+
+class Multiplexer:
+    def __init__(self):
+        self.sessions: Dict[ClientConnection, MultiplexSession] = {}
+
+    def open(self, connection: ClientConnection, format: str = "json") -> MultiplexSession:
+        session = self.sessions[connection] = MultiplexSession(connection, format)
+        session.start()
+        return session
+
+    async def close(self, session: MultiplexSession):
+        self.sessions.pop(session.connection, None)
+        await session.close()
+
+    def stats(self) -> List[dict]:
+        return [session.stats() for session in self.sessions.values()]
+
+multiplexer = Multiplexer()
@@ -0,0 +1,61 @@
+# backend/name_index.py
+
+import bisect
+from fnmatch import fnmatchcase
+from typing import Dict, Iterable, Iterator, List, Set
+
+GLOB_CHARS = "*?["
+
+class NameIndex:
+    # Basename -> paths carrying it, plus the distinct basenames sorted both
+    # as-is and reversed, so a glob's literal prefix or suffix narrows the
+    # names to test with one bisect instead of a tree walk
+    def __init__(self):
+        self.names: Dict[str, Set[str]] = {}
+        self.sorted_names: List[str] = []
+        self.sorted_reversed: List[str] = []
+
+    def add(self, path: str):
+        name = path.rpartition("/")[2]
+        paths = self.names.get(name)
+        if paths is None:
+            paths = self.names[name] = set()
+            bisect.insort(self.sorted_names, name)
+            bisect.insort(self.sorted_reversed, name[::-1])
+        paths.add(path)
+
+    def discard(self, path: str):
+        name = path.rpartition("/")[2]
+        paths = self.names.get(name)
+        if paths is None:
+            return
+        paths.discard(path)
+        if not paths:
+            del self.names[name]
+            del self.sorted_names[bisect.bisect_left(self.sorted_names, name)]
+            del self.sorted_reversed[bisect.bisect_left(self.sorted_reversed, name[::-1])]
+
+    def matching_names(self, pattern: str) -> Iterable[str]:
+        if not any(char in pattern for char in GLOB_CHARS):
+            return (pattern,) if pattern in self.names else ()
+        # Literal text before the first and after the last wildcard
+        prefix = pattern[:min(index for index, char in enumerate(pattern) if char in GLOB_CHARS)]
+        suffix = pattern[max(index for index, char in enumerate(pattern) if char in GLOB_CHARS + "]") + 1:]
+        start, end = _bounds(self.sorted_names, prefix)
+        reversed_start, reversed_end = _bounds(self.sorted_reversed, suffix[::-1])
+        if reversed_end - reversed_start < end - start:
+            candidates = (name[::-1] for name in self.sorted_reversed[reversed_start:reversed_end])
+        else:
+            candidates = iter(self.sorted_names[start:end])
+        return (name for name in candidates if fnmatchcase(name, pattern))
+
+    def paths(self, pattern: str) -> Iterator[str]:
+        for name in self.matching_names(pattern):
+            yield from self.names[name]
+
+def _bounds(ordered: List[str], prefix: str):
+    # Slice of a sorted list holding the entries that start with prefix
+    if not prefix:
+        return 0, len(ordered)
+    start = bisect.bisect_left(ordered, prefix)
+    return start, bisect.bisect_left(ordered, prefix[:-1] + chr(ord(prefix[-1]) + 1), start)
@@ -0,0 +1,110 @@
+# backend/queries.py
+
+import json
+from typing import AsyncIterator, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .database import AsyncSessionLocal
+
+# Rows fetched per keyset page while streaming an export
+EXPORT_BATCH_SIZE = 1000
+
+# Column selects rather than ORM entities: rows are plain tuples, so nothing
+# accumulates in the session identity map and the user name comes from a join
+# instead of one lazy load per log row.
+LOG_COLUMNS = (
+    models.Log.id,
+    models.Log.created_at,
+    models.Log.event_type,
+    models.Log.description,
+    models.Log.severity,
+    models.User.username,
+)
+
+SYSTEM_EVENT_COLUMNS = (
+    models.SystemEvent.id,
+    models.SystemEvent.created_at,
+    models.SystemEvent.event_type,
+    models.SystemEvent.component,
+    models.SystemEvent.message,
+    models.SystemEvent.severity,
+)
+
+def logs_query(severity: Optional[str] = None, event_type: Optional[str] = None, user: Optional[str] = None):
+    stmt = select(*LOG_COLUMNS).outerjoin(models.User, models.User.id == models.Log.user_id)
+    if severity:
+        stmt = stmt.where(models.Log.severity == severity)
+    if event_type:
+        stmt = stmt.where(models.Log.event_type == event_type)
+    if user:
+        stmt = stmt.where(models.User.username == user)
+    return stmt
+
+def system_events_query(severity: Optional[str] = None, event_type: Optional[str] = None):
+    stmt = select(*SYSTEM_EVENT_COLUMNS)
+    if severity:
+        stmt = stmt.where(models.SystemEvent.severity == severity)
+    if event_type:
+        stmt = stmt.where(models.SystemEvent.event_type == event_type)
+    return stmt
+
+def newest_first(stmt, model, cursor: Optional[Tuple] = None):
+    # Keyset page on the (created_at, id) index: rows strictly older than cursor
+    if cursor is not None:
+        created_at, row_id = cursor
+        stmt = stmt.where(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < row_id),
+        ))
+    return stmt.order_by(model.created_at.desc(), model.id.desc())
+
+async def fetch_page(db: AsyncSession, stmt, model, before: Optional[int], limit: int):
+    # `before` is a row id; its created_at completes the keyset position
+    cursor = None
+    if before is not None:
+        created_at = await db.scalar(select(model.created_at).where(model.id == before))
+        if created_at is None:
+            # Cursor row is gone: ids grow with time, so page by id alone
+            stmt = stmt.where(model.id < before)
+        else:
+            cursor = (created_at, before)
+    result = await db.execute(newest_first(stmt, model, cursor).limit(limit))
+    return result.all()
+
+def serialize_log(row) -> dict:
+    return {
+        "id": row.id,
+        "user": row.username or "system",
+        "event_type": row.event_type,
+        "description": row.description,
+        "severity": row.severity,
+        "timestamp": row.created_at.isoformat() if row.created_at else None
+    }
+
+def serialize_system_event(row) -> dict:
+    return {
+        "id": row.id,
+        "event_type": row.event_type,
+        "component": row.component,
+        "message": row.message,
+        "severity": row.severity,
+        "timestamp": row.created_at.isoformat() if row.created_at else None
+    }
+
+async def export_ndjson(stmt, model, serialize, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    # Streams every matching row, newest first, one keyset page at a time, so
+    # memory stays bounded by batch_size however many rows there are
+    cursor = None
+    async with AsyncSessionLocal() as db:
+        while True:
+            result = await db.execute(newest_first(stmt, model, cursor).limit(batch_size))
+            rows = result.all()
+            if not rows:
+                return
+            yield "".join(json.dumps(serialize(row)) + "\n" for row in rows).encode()
+            if len(rows) < batch_size:
+                return
+            cursor = (rows[-1].created_at, rows[-1].id)
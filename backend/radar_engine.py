@@ -0,0 +1,355 @@
+# backend/radar_engine.py
+
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+TARGET_TYPES = ("ally", "enemy")
+TYPE_CODES = {name: code for code, name in enumerate(TARGET_TYPES)}
+
+# Spawn ranges per target type: (xy extent, min distance, max distance)
+SPAWN_RANGES = {
+    "ally": (60.0, 50.0, 200.0),
+    "enemy": (80.0, 100.0, 300.0),
+}
+
+# Default edge length of a spatial grid cell, in radar scope units
+GRID_CELL_SIZE = 20.0
+# Cell keys are cx * _CELL_STRIDE + cy; cell coordinates must stay within +/- _CELL_STRIDE / 2
+_CELL_STRIDE = 1 << 21
+
+@dataclass(frozen=True)
+class Viewport:
+    # What one radar client can see: a disc of `range` around (cx, cy),
+    # optionally narrowed to the sector [sector_start, sector_start + sector_width]
+    # in degrees. Angles follow radar.js: 0 deg along +x, increasing towards +y.
+    cx: float = 0.0
+    cy: float = 0.0
+    range: Optional[float] = None
+    sector_start: Optional[float] = None
+    sector_width: Optional[float] = None
+
+    FIELDS = ("cx", "cy", "range", "sector_start", "sector_width")
+
+    @classmethod
+    def from_mapping(cls, params: Mapping) -> Optional["Viewport"]:
+        # Builds a viewport from query params or a JSON message; None if no field is set
+        values = {}
+        for name in cls.FIELDS:
+            raw = params.get(name)
+            if raw is None or raw == "":
+                continue
+            value = float(raw)
+            if not math.isfinite(value):
+                raise ValueError(f"invalid viewport {name}: {raw!r}")
+            values[name] = value
+        if not values:
+            return None
+        if values.get("range", 0.0) < 0 or values.get("sector_width", 0.0) < 0:
+            raise ValueError("viewport range and sector_width must be non-negative")
+        return cls(**values)
+
+def target_keys(ids: np.ndarray, types: np.ndarray) -> np.ndarray:
+    # Ids are numbered per type (ally_0, enemy_0, ...); the type makes them unique
+    return (types.astype(np.uint64) << np.uint64(32)) | ids.astype(np.uint64)
+
+def format_target_ids(ids: np.ndarray, types: np.ndarray) -> List[str]:
+    return [f"{TARGET_TYPES[t]}_{i}" for i, t in zip(ids.tolist(), types.tolist())]
+
+def format_targets(ids: np.ndarray, types: np.ndarray, x: np.ndarray, y: np.ndarray,
+                   distance: np.ndarray, bearing: np.ndarray) -> List[Dict]:
+    # Column-wise conversion: one tolist() per column instead of per-cell access
+    return [
+        {
+            "id": f"{TARGET_TYPES[t]}_{i}",
+            "x": tx,
+            "y": ty,
+            "type": TARGET_TYPES[t],
+            "distance": d,
+            "bearing": b,
+        }
+        for i, t, tx, ty, d, b in zip(ids.tolist(), types.tolist(), x.tolist(),
+                                     y.tolist(), distance.tolist(), bearing.tolist())
+    ]
+
+class TargetView:
+    # Dict-like view of one row of the store, so existing code doing
+    # target["x"] keeps working without materializing a dict per target.
+    __slots__ = ("_store", "_row")
+
+    FIELDS = ("id", "x", "y", "type", "distance", "bearing")
+
+    def __init__(self, store: "RadarTargetStore", row: int):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key: str):
+        store, row = self._store, self._row
+        if key == "id":
+            return store.format_id(row)
+        if key == "type":
+            return TARGET_TYPES[store.type[row]]
+        if key in ("x", "y", "distance", "bearing"):
+            return float(getattr(store, key)[row])
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        if key in ("x", "y", "distance", "bearing"):
+            getattr(self._store, key)[self._row] = value
+        elif key == "type":
+            self._store.type[self._row] = TYPE_CODES[value]
+        else:
+            raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self.FIELDS
+
+    def items(self):
+        return [(key, self[key]) for key in self.FIELDS]
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def to_dict(self) -> Dict:
+        return dict(self.items())
+
+class RadarTargetStore:
+    # Struct-of-arrays radar track store. Every column is a NumPy array of the
+    # same length and a tick updates all targets with one batched operation.
+    def __init__(self, capacity: int = 64, seed: Optional[int] = None):
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+        self.next_ids = {name: 0 for name in TARGET_TYPES}
+        self.index: Optional["SpatialGrid"] = None
+        self._alloc(max(capacity, 1))
+
+    def _alloc(self, capacity: int):
+        old = self.count
+        columns = {
+            "ids": np.uint32,
+            "type": np.uint8,
+            "x": np.float64,
+            "y": np.float64,
+            "distance": np.float64,
+            "bearing": np.float64,
+        }
+        for name, dtype in columns.items():
+            buf = np.zeros(capacity, dtype=dtype)
+            if old:
+                buf[:old] = getattr(self, "_" + name)[:old]
+            setattr(self, "_" + name, buf)
+        self.capacity = capacity
+
+    # Column accessors only expose the live rows
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[:self.count]
+
+    @property
+    def type(self) -> np.ndarray:
+        return self._type[:self.count]
+
+    @property
+    def x(self) -> np.ndarray:
+        return self._x[:self.count]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self._y[:self.count]
+
+    @property
+    def distance(self) -> np.ndarray:
+        return self._distance[:self.count]
+
+    @property
+    def bearing(self) -> np.ndarray:
+        return self._bearing[:self.count]
+
+    def format_id(self, row: int) -> str:
+        return f"{TARGET_TYPES[self._type[row]]}_{self._ids[row]}"
+
+    def spawn(self, target_type: str, count: int) -> np.ndarray:
+        if count <= 0:
+            return np.empty(0, dtype=np.uint32)
+        if self.count + count > self.capacity:
+            self._alloc(max(self.capacity * 2, self.count + count))
+
+        extent, min_dist, max_dist = SPAWN_RANGES[target_type]
+        start, end = self.count, self.count + count
+        rng = self.rng
+        next_id = self.next_ids[target_type]
+        new_ids = np.arange(next_id, next_id + count, dtype=np.uint32)
+        self._ids[start:end] = new_ids
+        self._type[start:end] = TYPE_CODES[target_type]
+        self._x[start:end] = rng.uniform(-extent, extent, count)
+        self._y[start:end] = rng.uniform(-extent, extent, count)
+        self._distance[start:end] = rng.integers(int(min_dist), int(max_dist), count, endpoint=True)
+        self._bearing[start:end] = rng.integers(0, 360, count, endpoint=True)
+        self.count = end
+        self.next_ids[target_type] = next_id + count
+        if self.index is not None:
+            self.index.rebuild()
+        return new_ids
+
+    def remove(self, target_type: str, ids: Sequence[int]):
+        # Compacts the live rows; row order of the survivors is preserved
+        keep = ~((self.type == TYPE_CODES[target_type]) & np.isin(self.ids, np.asarray(ids, dtype=np.uint32)))
+        survivors = int(keep.sum())
+        for name in ("ids", "type", "x", "y", "distance", "bearing"):
+            buf = getattr(self, "_" + name)
+            buf[:survivors] = buf[:self.count][keep]
+        self.count = survivors
+        if self.index is not None:
+            self.index.rebuild()
+
+    def clear(self):
+        self.count = 0
+        self.next_ids = {name: 0 for name in TARGET_TYPES}
+        if self.index is not None:
+            self.index.rebuild()
+
+    def step(self, jitter: float = 2.0, distance_jitter: float = 5.0):
+        # Batched random walk of every live target
+        n = self.count
+        if n == 0:
+            return
+        rng = self.rng
+        self.x[:] += rng.uniform(-jitter, jitter, n)
+        self.y[:] += rng.uniform(-jitter, jitter, n)
+        self.distance[:] += rng.uniform(-distance_jitter, distance_jitter, n)
+        bearing = self.bearing
+        bearing += rng.uniform(-jitter, jitter, n)
+        np.mod(bearing, 360.0, out=bearing)
+        if self.index is not None:
+            self.index.update()
+
+    def to_dicts(self, rows: Optional[np.ndarray] = None) -> List[Dict]:
+        if rows is None:
+            rows = slice(None, self.count)
+        return format_targets(self._ids[rows], self._type[rows], self._x[rows],
+                              self._y[rows], self._distance[rows], self._bearing[rows])
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, row: int) -> TargetView:
+        if row < 0:
+            row += self.count
+        if not 0 <= row < self.count:
+            raise IndexError(row)
+        return TargetView(self, row)
+
+    def __iter__(self) -> Iterator[TargetView]:
+        for row in range(self.count):
+            yield TargetView(self, row)
+
+class SpatialGrid:
+    # Uniform grid over target (x, y) positions. Each row remembers its cell,
+    # and after a tick only the rows that crossed a cell border are re-bucketed.
+    # Spawning or removing targets renumbers rows, so those trigger a rebuild.
+    def __init__(self, store: RadarTargetStore, cell_size: float = GRID_CELL_SIZE):
+        self.store = store
+        self.cell_size = cell_size
+        self.buckets: Dict[int, set] = {}
+        self.cells = np.empty(0, dtype=np.int64)
+        store.index = self
+        self.rebuild()
+
+    def _cell_keys(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        cx = np.floor(x / self.cell_size).astype(np.int64)
+        cy = np.floor(y / self.cell_size).astype(np.int64)
+        return cx * _CELL_STRIDE + cy
+
+    def _cell(self, value: float) -> int:
+        return math.floor(value / self.cell_size)
+
+    def rebuild(self):
+        store = self.store
+        self.cells = self._cell_keys(store.x, store.y)
+        buckets: Dict[int, set] = {}
+        for row, key in enumerate(self.cells.tolist()):
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = bucket = set()
+            bucket.add(row)
+        self.buckets = buckets
+
+    def update(self):
+        store = self.store
+        if len(self.cells) != store.count:
+            self.rebuild()
+            return
+        new_cells = self._cell_keys(store.x, store.y)
+        moved = np.flatnonzero(new_cells != self.cells)
+        if len(moved) == 0:
+            return
+        buckets = self.buckets
+        for row, old, new in zip(moved.tolist(), self.cells[moved].tolist(), new_cells[moved].tolist()):
+            bucket = buckets[old]
+            bucket.discard(row)
+            if not bucket:
+                del buckets[old]
+            bucket = buckets.get(new)
+            if bucket is None:
+                buckets[new] = bucket = set()
+            bucket.add(row)
+        self.cells = new_cells
+
+    def _candidates(self, xmin: float, ymin: float, xmax: float, ymax: float) -> np.ndarray:
+        if not all(map(math.isfinite, (xmin, ymin, xmax, ymax))):
+            return np.arange(self.store.count)
+        cx0, cx1 = self._cell(xmin), self._cell(xmax)
+        cy0, cy1 = self._cell(ymin), self._cell(ymax)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) >= len(self.buckets):
+            # Box covers more cells than are occupied: a vectorized scan is cheaper
+            return np.arange(self.store.count)
+        rows: List[int] = []
+        buckets = self.buckets
+        for cx in range(cx0, cx1 + 1):
+            base = cx * _CELL_STRIDE
+            for cy in range(cy0, cy1 + 1):
+                bucket = buckets.get(base + cy)
+                if bucket:
+                    rows.extend(bucket)
+        return np.fromiter(rows, dtype=np.intp, count=len(rows))
+
+    def query_bbox(self, xmin: float, ymin: float, xmax: float, ymax: float) -> np.ndarray:
+        rows = self._candidates(xmin, ymin, xmax, ymax)
+        x = self.store.x[rows]
+        y = self.store.y[rows]
+        mask = (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+        return np.sort(rows[mask])
+
+    def query_range(self, cx: float, cy: float, radius: float) -> np.ndarray:
+        rows = self._candidates(cx - radius, cy - radius, cx + radius, cy + radius)
+        dx = self.store.x[rows] - cx
+        dy = self.store.y[rows] - cy
+        return np.sort(rows[dx * dx + dy * dy <= radius * radius])
+
+    def query_sector(self, cx: float, cy: float, radius: float, start: float, width: float) -> np.ndarray:
+        rows = self.query_range(cx, cy, radius)
+        if width >= 360.0:
+            return rows
+        angles = np.degrees(np.arctan2(self.store.y[rows] - cy, self.store.x[rows] - cx))
+        return rows[np.mod(angles - start, 360.0) <= width]
+
+    def query_viewport(self, viewport: Optional[Viewport]) -> Optional[np.ndarray]:
+        # None means "everything"; callers can then skip the fancy indexing
+        if viewport is None or (viewport.range is None and viewport.sector_width is None):
+            return None
+        radius = math.inf if viewport.range is None else viewport.range
+        if viewport.sector_width is None:
+            return self.query_range(viewport.cx, viewport.cy, radius)
+        return self.query_sector(viewport.cx, viewport.cy, radius,
+                                 viewport.sector_start or 0.0, viewport.sector_width)
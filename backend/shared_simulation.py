@@ -0,0 +1,306 @@
+# backend/shared_simulation.py
+
+import logging
+import os
+import struct
+import tempfile
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional
+
+import numpy as np
+
+from .binary_frames import TELEMETRY_FIELDS, TELEMETRY_STATUSES
+from .radar_engine import TYPE_CODES
+
+try:
+    import fcntl
+except ImportError:  # not POSIX; only "local" mode is available
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# "local": every process runs its own simulation (single worker).
+# "shared": one owner process advances the simulation and publishes each tick
+# through shared memory; every worker serves its clients from that state.
+SIMULATION_MODE = os.getenv("AURORA_SIMULATION_MODE", "local")
+SHARED_NAME = os.getenv("AURORA_SHARED_NAME", "aurora_simulation")
+# Whoever holds this lock owns the simulation; when the owner exits another worker takes over
+SHARED_LOCK = os.getenv("AURORA_SHARED_LOCK", os.path.join(tempfile.gettempdir(), "aurora_simulation.lock"))
+# Radar targets the shared buffer has room for
+SHARED_RADAR_CAPACITY = int(os.getenv("AURORA_SHARED_RADAR_CAPACITY", "4096"))
+# Seconds between a reader's attempts to take over ownership
+SHARED_TAKEOVER_INTERVAL = float(os.getenv("AURORA_SHARED_TAKEOVER_INTERVAL", "1"))
+
+# Buffer layout (little-endian, fixed for a given capacity):
+#   header     magic "AXSM", u16 version, u16 flags, u64 seq, u32 radar_tick,
+#              u32 telemetry_tick, u32 radar_count, u32 capacity, f64 published_at
+#   telemetry  f64 per TELEMETRY_FIELDS entry, u8 status code, 7 pad
+#   radar      capacity entries per column: x, y, distance, bearing f64;
+#              ids u32; type u8
+# `seq` is a sequence lock: the owner makes it odd before writing and even
+# after; a reader retries a copy whenever seq was odd or changed under it.
+SHARED_MAGIC = b"AXSM"
+SHARED_VERSION = 1
+HEADER = struct.Struct("<4sHHQIIIId")
+SEQ_OFFSET = 8
+TELEMETRY = struct.Struct("<%ddB7x" % len(TELEMETRY_FIELDS))
+RADAR_COLUMNS = (
+    ("x", np.dtype("<f8")),
+    ("y", np.dtype("<f8")),
+    ("distance", np.dtype("<f8")),
+    ("bearing", np.dtype("<f8")),
+    ("ids", np.dtype("<u4")),
+    ("type", np.dtype("u1")),
+)
+_STATUS_CODES = {name: code for code, name in enumerate(TELEMETRY_STATUSES)}
+# Copies attempted before a reader gives up on a tick and looks again later
+READ_ATTEMPTS = 8
+
+def buffer_size(capacity: int) -> int:
+    return HEADER.size + TELEMETRY.size + capacity * sum(dtype.itemsize for _, dtype in RADAR_COLUMNS)
+
+@contextmanager
+def untracked():
+    # Workers come and go independently, so no process may let the resource
+    # tracker unlink the segment when it exits. The segment is never registered
+    # (rather than registered and then unregistered): the tracker is shared by
+    # every worker and keeps one entry per name, so interleaved pairs from two
+    # workers would end in a KeyError on the second unregister.
+    register, unregister = resource_tracker.register, resource_tracker.unregister
+    resource_tracker.register = lambda name, rtype: None if rtype == "shared_memory" else register(name, rtype)
+    resource_tracker.unregister = lambda name, rtype: None if rtype == "shared_memory" else unregister(name, rtype)
+    try:
+        yield
+    finally:
+        resource_tracker.register, resource_tracker.unregister = register, unregister
+
+class SharedSimulation:
+    # Drives the radar and telemetry streams in "shared" mode. The owner steps
+    # its SimulationManager and publishes the result; every other worker
+    # mirrors the published state into its own SimulationManager, so viewport
+    # queries, delta encoders, binary frames and telemetry history work the
+    # same in every process. A step returns False when there is no new tick
+    # yet, and the stream looks again shortly.
+    def __init__(self, simulation, name: str = SHARED_NAME, lock_path: str = SHARED_LOCK,
+                 capacity: int = SHARED_RADAR_CAPACITY):
+        self.simulation = simulation
+        self.name = name
+        self.lock_path = lock_path
+        self.capacity = capacity
+        self.owner = False
+        self.memory: Optional[shared_memory.SharedMemory] = None
+        self.columns = {}
+        self.radar_tick = 0
+        self.telemetry_tick = 0
+        self.read_retries = 0
+        self.truncated = False
+        self._lock_file = None
+        self._takeover_at = 0.0
+
+    def start(self):
+        if fcntl is None:
+            raise RuntimeError("AURORA_SIMULATION_MODE=shared needs a POSIX system")
+        self._try_own()
+        if not self.owner:
+            self._attach()
+
+    def stop(self):
+        if self.memory is not None:
+            self.memory.close()
+            self.memory = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self.owner = False
+
+    def _try_own(self) -> bool:
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        was_reader = self.memory is not None
+        if not was_reader:
+            self._attach(create=True)
+        self.owner = True
+        logger.info("pid %d owns the shared simulation%s", os.getpid(), " (took over)" if was_reader else "")
+        if not was_reader:
+            self.publish_radar()
+            self.publish_telemetry()
+        return True
+
+    def _attach(self, create: bool = False):
+        size = buffer_size(self.capacity)
+        if create:
+            with untracked():
+                try:
+                    memory = shared_memory.SharedMemory(self.name, create=True, size=size)
+                except FileExistsError:
+                    # Left by an earlier run; reused when it has the same layout
+                    memory = shared_memory.SharedMemory(self.name)
+                    if memory.size < size:
+                        memory.close()
+                        memory.unlink()
+                        memory = shared_memory.SharedMemory(self.name, create=True, size=size)
+            HEADER.pack_into(memory.buf, 0, SHARED_MAGIC, SHARED_VERSION, 0, 0, 0, 0, 0, self.capacity, 0.0)
+        else:
+            memory = self._wait_for_owner()
+        self.memory = memory
+        offset = HEADER.size + TELEMETRY.size
+        self.columns = {}
+        for name, dtype in RADAR_COLUMNS:
+            self.columns[name] = np.ndarray(self.capacity, dtype=dtype, buffer=memory.buf, offset=offset)
+            offset += self.capacity * dtype.itemsize
+
+    def _wait_for_owner(self, timeout: float = 10.0) -> shared_memory.SharedMemory:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with untracked():
+                    memory = shared_memory.SharedMemory(self.name)
+                magic, version, _, _, _, _, _, capacity, _ = HEADER.unpack_from(memory.buf, 0)
+                if magic == SHARED_MAGIC and version == SHARED_VERSION and capacity == self.capacity:
+                    return memory
+                memory.close()
+            except FileNotFoundError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"no shared simulation {self.name!r} with capacity {self.capacity}")
+            time.sleep(0.1)
+
+    # Owner side
+
+    def _begin_write(self) -> int:
+        # Always odd, even when a previous owner died mid-write and left seq odd
+        seq = (self._seq() + 1) | 1
+        struct.pack_into("<Q", self.memory.buf, SEQ_OFFSET, seq)
+        return seq
+
+    def _end_write(self, seq: int):
+        buf = self.memory.buf
+        _, _, _, _, _, _, count, capacity, _ = HEADER.unpack_from(buf, 0)
+        HEADER.pack_into(buf, 0, SHARED_MAGIC, SHARED_VERSION, 0, seq + 1, self.radar_tick, self.telemetry_tick,
+                         count, capacity, time.time())
+
+    def _seq(self) -> int:
+        return struct.unpack_from("<Q", self.memory.buf, SEQ_OFFSET)[0]
+
+    def publish_radar(self):
+        store = self.simulation.radar_targets
+        count = min(store.count, self.capacity)
+        if count < store.count and not self.truncated:
+            logger.warning("shared radar buffer holds %d of %d targets", count, store.count)
+            self.truncated = True
+        seq = self._begin_write()
+        for name, column in self.columns.items():
+            column[:count] = getattr(store, "_" + name)[:count]
+        struct.pack_into("<I", self.memory.buf, 24, count)
+        self.radar_tick += 1
+        self._end_write(seq)
+
+    def publish_telemetry(self):
+        telemetry = self.simulation.telemetry_data
+        seq = self._begin_write()
+        TELEMETRY.pack_into(self.memory.buf, HEADER.size, *(float(telemetry[name]) for name in TELEMETRY_FIELDS),
+                            _STATUS_CODES.get(telemetry.get("status"), 0))
+        self.telemetry_tick += 1
+        self._end_write(seq)
+
+    # Reader side
+
+    def _read(self, copy):
+        # Runs copy() until it saw one consistent version of the buffer;
+        # returns (header fields, copy's result) or None
+        buf = self.memory.buf
+        for _ in range(READ_ATTEMPTS):
+            header = HEADER.unpack_from(buf, 0)
+            if header[3] % 2:
+                self.read_retries += 1
+                continue
+            result = copy(header)
+            if self._seq() == header[3]:
+                return header, result
+            self.read_retries += 1
+        return None
+
+    def sync_radar(self) -> bool:
+        def copy(header):
+            count = header[6]
+            return {name: np.array(column[:count]) for name, column in self.columns.items()}
+
+        read = self._read(copy)
+        if read is None:
+            return False
+        header, columns = read
+        radar_tick, count = header[4], header[6]
+        if radar_tick == self.radar_tick:
+            return False
+        store = self.simulation.radar_targets
+        if count > store.capacity:
+            store._alloc(count)
+        for name, values in columns.items():
+            getattr(store, "_" + name)[:count] = values
+        store.count = count
+        for name, code in TYPE_CODES.items():
+            ids = columns["ids"][columns["type"] == code]
+            store.next_ids[name] = int(ids.max()) + 1 if len(ids) else 0
+        if store.index is not None:
+            store.index.update()
+        self.radar_tick = radar_tick
+        return True
+
+    def sync_telemetry(self) -> bool:
+        read = self._read(lambda header: TELEMETRY.unpack_from(self.memory.buf, HEADER.size))
+        if read is None:
+            return False
+        header, values = read
+        telemetry_tick = header[5]
+        if telemetry_tick == self.telemetry_tick:
+            return False
+        telemetry = self.simulation.telemetry_data
+        telemetry.update(zip(TELEMETRY_FIELDS, values))
+        telemetry["status"] = TELEMETRY_STATUSES[values[-1]] if values[-1] < len(TELEMETRY_STATUSES) else "NOMINAL"
+        self.simulation.telemetry_history.append(time.time(), telemetry)
+        self.telemetry_tick = telemetry_tick
+        return True
+
+    # Stream steps
+
+    def _check_takeover(self):
+        now = time.monotonic()
+        if not self.owner and now >= self._takeover_at:
+            self._takeover_at = now + SHARED_TAKEOVER_INTERVAL
+            self._try_own()
+
+    def step_radar(self) -> bool:
+        self._check_takeover()
+        if not self.owner:
+            return self.sync_radar()
+        self.simulation.update_radar()
+        self.publish_radar()
+        return True
+
+    def step_telemetry(self) -> bool:
+        self._check_takeover()
+        if not self.owner:
+            return self.sync_telemetry()
+        self.simulation.update_telemetry()
+        self.publish_telemetry()
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "mode": SIMULATION_MODE,
+            "pid": os.getpid(),
+            "owner": self.owner,
+            "name": self.name,
+            "capacity": self.capacity,
+            "seq": self._seq() if self.memory is not None else None,
+            "radar_tick": self.radar_tick,
+            "telemetry_tick": self.telemetry_tick,
+            "read_retries": self.read_retries,
+        }
@@ -0,0 +1,155 @@
+# backend/telemetry_history.py
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+class _RingLevel:
+    # Fixed-size ring of aggregated buckets. Level 0 holds raw samples; each
+    # bucket of level k + 1 aggregates `factor` consecutive buckets of level k.
+    def __init__(self, capacity: int, field_count: int):
+        self.capacity = capacity
+        self.t = np.zeros(capacity, dtype=np.float64)
+        self.mins = np.zeros((capacity, field_count), dtype=np.float64)
+        self.maxs = np.zeros((capacity, field_count), dtype=np.float64)
+        self.sums = np.zeros((capacity, field_count), dtype=np.float64)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.head = 0
+        self.size = 0
+        # Partial bucket that will become this level's next entry
+        self.pending: Optional[list] = None
+        self.pending_children = 0
+
+    @property
+    def start(self) -> int:
+        return (self.head - self.size) % self.capacity
+
+    def push(self, t: float, mins: np.ndarray, maxs: np.ndarray, sums: np.ndarray, count: int):
+        i = self.head
+        self.t[i] = t
+        self.mins[i] = mins
+        self.maxs[i] = maxs
+        self.sums[i] = sums
+        self.counts[i] = count
+        self.head = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def oldest(self) -> Optional[float]:
+        return float(self.t[self.start]) if self.size else None
+
+    def bisect(self, value: float, side: str) -> int:
+        # Logical position of `value` in the time-ordered ring, O(log n)
+        start, size, cap = self.start, self.size, self.capacity
+        if start + size <= cap:
+            return int(np.searchsorted(self.t[start:start + size], value, side))
+        older = self.t[start:cap]
+        if value < older[-1] or (side == "left" and value == older[-1]):
+            return int(np.searchsorted(older, value, side))
+        return len(older) + int(np.searchsorted(self.t[:self.head], value, side))
+
+    def rows(self, lo: int, hi: int) -> np.ndarray:
+        return (np.arange(lo, hi) + self.start) % self.capacity
+
+class TelemetryHistory:
+    # Array-backed telemetry history: a fixed-size ring per resolution level,
+    # each level `factor` times coarser than the one below. A query picks the
+    # finest level that still answers with O(points * factor) buckets, so its
+    # cost follows the requested points rather than the buffer size.
+    def __init__(self, fields: Sequence[str], capacity: int = 7200, levels: int = 6, factor: int = 4):
+        self.fields = tuple(fields)
+        self.factor = max(2, factor)
+        self.levels = [_RingLevel(max(1, capacity), len(self.fields)) for _ in range(max(1, levels))]
+
+    def append(self, timestamp: float, sample: Dict):
+        values = np.array([float(sample[name]) for name in self.fields], dtype=np.float64)
+        self._push(0, timestamp, values, values, values, 1)
+
+    def _push(self, level_index: int, t: float, mins: np.ndarray, maxs: np.ndarray, sums: np.ndarray, count: int):
+        self.levels[level_index].push(t, mins, maxs, sums, count)
+        if level_index + 1 == len(self.levels):
+            return
+        parent = self.levels[level_index + 1]
+        if parent.pending is None:
+            parent.pending = [t, mins.copy(), maxs.copy(), sums.copy(), count]
+        else:
+            pending = parent.pending
+            np.minimum(pending[1], mins, out=pending[1])
+            np.maximum(pending[2], maxs, out=pending[2])
+            pending[3] += sums
+            pending[4] += count
+        parent.pending_children += 1
+        if parent.pending_children == self.factor:
+            pending = parent.pending
+            parent.pending = None
+            parent.pending_children = 0
+            self._push(level_index + 1, *pending)
+
+    def __len__(self) -> int:
+        return self.levels[0].size
+
+    def _pick_level(self, start: float, end: float, points: int):
+        budget = points * self.factor
+        for index, level in enumerate(self.levels):
+            if not level.size:
+                continue
+            lo, hi = level.bisect(start, "left"), level.bisect(end, "right")
+            coarsest = index == len(self.levels) - 1 or not self.levels[index + 1].size
+            covers_start = level.oldest() <= start
+            if hi - lo <= budget and (covers_start or coarsest):
+                return index, level, lo, hi
+            if coarsest:
+                return index, level, lo, hi
+        return None
+
+    def query(self, start: float, end: float, points: int = 500, fields: Optional[Sequence[str]] = None) -> Dict:
+        points = max(1, points)
+        names = self.fields if not fields else tuple(name for name in fields if name in self.fields)
+        columns = [self.fields.index(name) for name in names]
+        result = {"from": start, "to": end, "level": 0, "t": [], "series": {name: {"min": [], "max": [], "avg": []} for name in names}}
+        picked = self._pick_level(start, end, points)
+        if picked is None:
+            return result
+        index, level, lo, hi = picked
+        rows = level.rows(lo, hi)
+        t = level.t[rows]
+        mins = level.mins[rows][:, columns]
+        maxs = level.maxs[rows][:, columns]
+        sums = level.sums[rows][:, columns]
+        counts = level.counts[rows]
+
+        # Coarse levels lag behind by their unfinished bucket; include it so the
+        # series reaches the newest samples
+        if index and level.pending is not None and start <= level.pending[0] <= end:
+            pt, pmins, pmaxs, psums, pcount = level.pending
+            t = np.append(t, pt)
+            mins = np.vstack([mins, pmins[columns]])
+            maxs = np.vstack([maxs, pmaxs[columns]])
+            sums = np.vstack([sums, psums[columns]])
+            counts = np.append(counts, pcount)
+
+        if len(t) > points:
+            # Equal-count buckets, reduced with min/max/sum in one pass each
+            edges = np.linspace(0, len(t), points + 1).astype(np.int64)[:-1]
+            edges = np.unique(edges)
+            t = t[edges]
+            mins = np.minimum.reduceat(mins, edges, axis=0)
+            maxs = np.maximum.reduceat(maxs, edges, axis=0)
+            sums = np.add.reduceat(sums, edges, axis=0)
+            counts = np.add.reduceat(counts, edges)
+
+        avgs = sums / counts[:, None] if len(counts) else sums
+        result["level"] = index
+        result["t"] = t.tolist()
+        for column, name in enumerate(names):
+            series = result["series"][name]
+            series["min"] = mins[:, column].tolist()
+            series["max"] = maxs[:, column].tolist()
+            series["avg"] = avgs[:, column].tolist()
+        return result
+
+    def span(self) -> List[Optional[float]]:
+        # [oldest, newest] raw timestamps still held at full resolution
+        raw = self.levels[0]
+        if not raw.size:
+            return [None, None]
+        return [raw.oldest(), float(raw.t[(raw.head - 1) % raw.capacity])]
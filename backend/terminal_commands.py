@@ -0,0 +1,353 @@
+# backend/terminal_commands.py
+
+import re
+import shlex
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from .content_index import content_candidates, search_plan
+
+# A command reads its input and writes its output as iterators of lines
+# (without the trailing newline). Stages of a pipeline are chained
+# generators, so `cat big | grep x | head` holds one line per stage at a
+# time and stops reading as soon as head has what it needs.
+Lines = Iterator[str]
+Handler = Callable[["TerminalEngine", List[str], Optional[Lines]], Lines]
+
+class CommandError(Exception):
+    # Raised by a stage; the message is shown and the pipeline stops there
+    pass
+
+class CommandCancelled(Exception):
+    # Raised at a checkpoint once the running command was cancelled (Ctrl-C,
+    # timeout, closed socket); the terminal runner ends the command there
+    pass
+
+# Cancel event of the command running on the current worker thread
+_running = threading.local()
+# Lines read between two cancellation checkpoints
+CHECKPOINT_LINES = 1024
+
+@contextmanager
+def cancellable(cancel: threading.Event):
+    _running.cancel = cancel
+    try:
+        yield
+    finally:
+        _running.cancel = None
+
+def checkpoint():
+    # Called by loops that may run long without producing any output
+    cancel = getattr(_running, "cancel", None)
+    if cancel is not None and cancel.is_set():
+        raise CommandCancelled()
+
+class Command(NamedTuple):
+    name: str
+    handler: Handler
+    min_args: int
+    max_args: Optional[int]
+    usage: str
+
+COMMANDS: Dict[str, Command] = {}
+
+def command(name: str, min_args: int = 0, max_args: Optional[int] = None, usage: str = ""):
+    # Registers a handler; argument counts are checked before anything runs
+    def register(handler: Handler) -> Handler:
+        COMMANDS[name] = Command(name, handler, min_args, max_args, usage or f"{name}: invalid arguments")
+        return handler
+    return register
+
+class Stage(NamedTuple):
+    command: Command
+    args: List[str]
+    # (">" or ">>", path) when the stage's output goes to a file
+    redirect: Optional[Tuple[str, str]]
+
+def tokenize(line: str) -> List[str]:
+    lexer = shlex.shlex(line, posix=True, punctuation_chars="|>")
+    lexer.whitespace_split = True
+    return list(lexer)
+
+def parse_pipeline(line: str) -> List[Stage]:
+    try:
+        tokens = tokenize(line)
+    except ValueError as exc:
+        raise CommandError(f"aurora: {exc}")
+    if not tokens:
+        return []
+    stages = []
+    words: List[str] = []
+    redirect = None
+    position = 0
+    while position <= len(tokens):
+        token = tokens[position] if position < len(tokens) else None
+        if token is None or token == "|":
+            if not words:
+                raise CommandError(f"aurora: syntax error near unexpected token `{token or 'newline'}'")
+            stages.append(_stage(words, redirect))
+            words, redirect = [], None
+            if token is None:
+                break
+        elif token in (">", ">>"):
+            if position + 1 >= len(tokens) or tokens[position + 1] in ("|", ">", ">>"):
+                raise CommandError("aurora: syntax error near unexpected token `newline'")
+            position += 1
+            redirect = (token, tokens[position])
+        else:
+            words.append(token)
+        position += 1
+    return stages
+
+def _stage(words: List[str], redirect: Optional[Tuple[str, str]]) -> Stage:
+    name, args = words[0], words[1:]
+    spec = COMMANDS.get(name)
+    if spec is None:
+        raise CommandError(f"{name}: command not found")
+    if len(args) < spec.min_args or (spec.max_args is not None and len(args) > spec.max_args):
+        raise CommandError(spec.usage)
+    return Stage(spec, args, redirect)
+
+def iter_lines(text: str) -> Lines:
+    # Lines of text without building the split list
+    start = 0
+    count = 0
+    while True:
+        count += 1
+        if count % CHECKPOINT_LINES == 0:
+            checkpoint()
+        end = text.find("\n", start)
+        if end < 0:
+            if start < len(text):
+                yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+def file_lines(vfs, name: str, path: str) -> Lines:
+    node = vfs.resolve(path)
+    if node is None:
+        raise CommandError(f"{name}: {path}: No such file or directory")
+    if node.is_dir:
+        raise CommandError(f"{name}: {path}: Is a directory")
+    return iter_lines(node.text)
+
+def input_lines(vfs, name: str, paths: List[str], stdin: Optional[Lines]) -> Lines:
+    # Named files in order, or the piped input when none are given
+    if not paths:
+        if stdin is not None:
+            yield from stdin
+        return
+    for path in paths:
+        yield from file_lines(vfs, name, path)
+
+def display_path(given: str, abs_start: str, path: str) -> str:
+    # A path found under abs_start, spelled relative to what the user typed
+    if path == abs_start:
+        return given
+    return given.rstrip("/") + path[len(abs_start.rstrip("/")):]
+
+def check(result: str) -> Lines:
+    # VirtualFileSystem methods return an error message, or "" on success
+    if result:
+        raise CommandError(result)
+    return iter(())
+
+def count_option(name: str, args: List[str], default: int) -> Tuple[int, List[str]]:
+    # `-n N` / `-N` as accepted by head and tail
+    if args and args[0] == "-n":
+        if len(args) < 2 or not args[1].isdigit():
+            raise CommandError(f"{name}: invalid number of lines")
+        return int(args[1]), args[2:]
+    if args and args[0].startswith("-") and args[0][1:].isdigit():
+        return int(args[0][1:]), args[1:]
+    return default, args
+
+@command("ls", max_args=1)
+def _ls(engine, args, stdin):
+    return iter(engine.vfs.ls(*args))
+
+@command("cd", max_args=1)
+def _cd(engine, args, stdin):
+    return check(engine.vfs.cd(*args))
+
+@command("pwd", max_args=0)
+def _pwd(engine, args, stdin):
+    yield engine.vfs.pwd()
+
+@command("mkdir", min_args=1, max_args=1, usage="mkdir: missing operand")
+def _mkdir(engine, args, stdin):
+    return check(engine.vfs.mkdir(args[0]))
+
+@command("rmdir", min_args=1, max_args=1, usage="rmdir: missing operand")
+def _rmdir(engine, args, stdin):
+    return check(engine.vfs.rmdir(args[0]))
+
+@command("touch", min_args=1, max_args=1, usage="touch: missing file operand")
+def _touch(engine, args, stdin):
+    return check(engine.vfs.touch(args[0]))
+
+@command("rm", min_args=1, max_args=1, usage="rm: missing operand")
+def _rm(engine, args, stdin):
+    return check(engine.vfs.rm(args[0]))
+
+@command("cat")
+def _cat(engine, args, stdin):
+    return input_lines(engine.vfs, "cat", args, stdin)
+
+@command("echo")
+def _echo(engine, args, stdin):
+    yield " ".join(args)
+
+@command("cp", min_args=2, max_args=2, usage="cp: missing file operand")
+def _cp(engine, args, stdin):
+    return check(engine.vfs.cp(args[0], args[1]))
+
+@command("mv", min_args=2, max_args=2, usage="mv: missing file operand")
+def _mv(engine, args, stdin):
+    return check(engine.vfs.mv(args[0], args[1]))
+
+def split_flags(name: str, args: List[str], allowed: str) -> Tuple[Set[str], List[str]]:
+    # Leading single-letter flags, combinable (-rE); "--" ends them
+    flags: Set[str] = set()
+    while args and args[0].startswith("-") and len(args[0]) > 1:
+        option, args = args[0], args[1:]
+        if option == "--":
+            break
+        for letter in option[1:]:
+            if letter not in allowed:
+                raise CommandError(f"{name}: invalid option -- '{letter}'")
+            flags.add(letter)
+    return flags, args
+
+@command("grep", min_args=1, usage="grep: missing pattern or file")
+def _grep(engine, args, stdin):
+    # grep [-r] [-E] pattern [path ...]; with -r only files the content index
+    # cannot rule out are read
+    flags, args = split_flags("grep", args, "rRE")
+    if not args:
+        raise CommandError("grep: missing pattern or file")
+    pattern, paths = args[0], args[1:]
+    try:
+        matches, literals = search_plan(pattern, "E" in flags)
+    except re.error as exc:
+        raise CommandError(f"grep: invalid regular expression: {exc}")
+    try:
+        yield from _grep_lines(engine, matches, literals, flags, paths, stdin)
+    except re.error as exc:
+        # A line too long to run a regular expression over
+        raise CommandError(f"grep: {exc}")
+
+def _grep_lines(engine, matches, literals, flags: Set[str], paths: List[str], stdin: Optional[Lines]) -> Lines:
+    recursive = bool(flags & {"r", "R"})
+    if not paths and not recursive:
+        if stdin is not None:
+            yield from (line for line in stdin if matches(line))
+        return
+    vfs = engine.vfs
+    candidates = content_candidates(vfs, literals)
+    label = recursive or len(paths) > 1
+    for path in paths or ["."]:
+        abs_path = vfs.abspath(path)
+        node = vfs.lookup(abs_path)
+        if node is None:
+            raise CommandError(f"grep: {path}: No such file or directory")
+        if node.is_dir and not recursive:
+            raise CommandError(f"grep: {path}: Is a directory")
+        for file_path, file_node in vfs.walk(abs_path, node):
+            if file_node.is_dir or (candidates is not None and file_node not in candidates):
+                continue
+            shown = display_path(path, abs_path, file_path)
+            for line in iter_lines(file_node.text):
+                if matches(line):
+                    yield f"{shown}:{line}" if label else line
+
+FIND_KINDS = ("f", "d")
+
+@command("find")
+def _find(engine, args, stdin):
+    # find [path ...] [-name GLOB] [-type f|d] [-maxdepth N]; the older
+    # `find path name` form still works
+    vfs = engine.vfs
+    position = 0
+    while position < len(args) and not args[position].startswith("-"):
+        position += 1
+    paths, options = args[:position], args[position:]
+    name = kind = maxdepth = None
+    if len(paths) == 2 and not options:
+        paths, name = paths[:1], paths[1]
+    for index in range(0, len(options), 2):
+        option = options[index]
+        if option not in ("-name", "-type", "-maxdepth"):
+            raise CommandError(f"find: unknown predicate `{option}'")
+        if index + 1 >= len(options):
+            raise CommandError(f"find: missing argument to `{option}'")
+        value = options[index + 1]
+        if option == "-name":
+            name = value
+        elif option == "-type":
+            if value not in FIND_KINDS:
+                raise CommandError(f"find: Unknown argument to -type: {value}")
+            kind = value
+        else:
+            if not value.isdigit():
+                raise CommandError(f"find: invalid argument `{value}' to `-maxdepth'")
+            maxdepth = int(value)
+    for path in paths or ["."]:
+        abs_path = vfs.abspath(path)
+        if vfs.lookup(abs_path) is None:
+            raise CommandError(f"find: '{path}': No such file or directory")
+        for found in vfs.find_paths(abs_path, name, kind, maxdepth):
+            yield display_path(path, abs_path, found)
+
+@command("head")
+def _head(engine, args, stdin):
+    count, paths = count_option("head", args, 10)
+    for index, line in enumerate(input_lines(engine.vfs, "head", paths, stdin)):
+        if index >= count:
+            return
+        yield line
+
+@command("tail")
+def _tail(engine, args, stdin):
+    count, paths = count_option("tail", args, 10)
+    return iter(deque(input_lines(engine.vfs, "tail", paths, stdin), maxlen=count) if count else ())
+
+@command("wc")
+def _wc(engine, args, stdin):
+    # Line count only; -l is accepted for familiarity
+    paths = [arg for arg in args if arg != "-l"]
+    yield str(sum(1 for _ in input_lines(engine.vfs, "wc", paths, stdin)))
+
+@command("clear", max_args=0)
+def _clear(engine, args, stdin):
+    yield "\033[2J\033[H"  # ANSI escape codes to clear screen
+
+@command("whoami", max_args=0)
+def _whoami(engine, args, stdin):
+    yield "commander"
+
+@command("date", max_args=0)
+def _date(engine, args, stdin):
+    yield datetime.now().strftime("%a %b %d %H:%M:%S %Z %Y")
+
+@command("uname")
+def _uname(engine, args, stdin):
+    yield "Linux aurora-x 5.10.0-aurora #1 SMP Fri Jan 1 00:00:00 UTC 2021 x86_64 GNU/Linux"
+
+@command("history", max_args=0)
+def _history(engine, args, stdin):
+    # Numbered by the session's command count, since older entries roll off
+    recent = list(engine.history)[-10:]
+    offset = engine.generation - len(recent)
+    for index, line in enumerate(recent):
+        yield f"{offset + index + 1}  {line}"
+
+@command("help", max_args=0)
+def _help(engine, args, stdin):
+    yield "Available commands:"
+    yield ", ".join(COMMANDS)
+    yield "Pipe with |, redirect output with > or >> (echo text > file writes a file)"
@@ -1,69 +1,277 @@
 # backend/terminal_engine.py
 
 import os
-import shlex
-from typing import List, Dict, Tuple
+import posixpath
+import sys
+import threading
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .content_index import TrigramIndex
+from .name_index import NameIndex
+from .terminal_commands import CommandCancelled, CommandError, checkpoint, parse_pipeline
+
+HOME = "/home/commander"
+# Commands each session remembers for `history`
+TERMINAL_HISTORY_SIZE = int(os.getenv("AURORA_TERMINAL_HISTORY", "1000"))
+
+def is_within(path: str, root: str) -> bool:
+    # path is root or below it; "/" contains every path
+    return path == root or path.startswith(root.rstrip("/") + "/")
+
+def relative(path: str, root: str) -> str:
+    # "" for root itself, otherwise "/"-prefixed, also when root is "/"
+    return "" if path == root else path[len(root.rstrip("/")):]
+
+class Inode:
+    # One file or directory. Directories map child names to inodes; files
+    # carry their text in `data`. In a copy-on-write overlay the entry names
+    # are authoritative but the node behind a name is always resolved by path,
+    # since a child may have been copied up after its directory was.
+    __slots__ = ("ino", "name", "parent", "children", "data")
+
+    def __init__(self, ino: int, name: str, parent: Optional["Inode"], children: Optional[Dict[str, "Inode"]] = None,
+                 data: str = ""):
+        self.ino = ino
+        self.name = name
+        self.parent = parent
+        self.children = children
+        self.data = data
+
+    @property
+    def is_dir(self) -> bool:
+        return self.children is not None
+
+    @property
+    def text(self) -> str:
+        data = self.data
+        if not isinstance(data, str):
+            # Content restored from a snapshot is decoded on first read
+            data = self.data = data.decode()
+        return data
 
 class VirtualFileSystem:
-    def __init__(self):
-        self.current_path = "/home/commander"
-        self.filesystem = {
-            "/home": {"commander": {}, "guest": {}},
-            "/etc": {"config.txt": "system config"},
-            "/bin": {},
-            "/var": {"logs": {}},
-            "/logs": {},
-        }
+    # Inode table plus a path -> inode map: resolving a normalized absolute
+    # path is a single dict lookup however deep the tree is. The map is kept
+    # in sync by every operation that adds, removes or moves nodes.
+    #
+    # Given a `base`, the filesystem is a copy-on-write overlay on that shared
+    # image, which is never modified: `paths` holds only what this session
+    # created, changed or moved, `whiteouts` the base paths it removed, and a
+    # base node is copied into the overlay the first time it is written.
+    def __init__(self, base: Optional["VirtualFileSystem"] = None):
+        self.base = base
+        self.current_path = HOME
+        self.inodes: List[Optional[Inode]] = []
+        self.free_inodes: List[int] = []
+        self.paths: Dict[str, Inode] = {}
+        self.whiteouts: Set[str] = set()
+        # Contents of the files this layer owns; searches union it with the base's
+        self.index = TrigramIndex()
+        # Basenames of this layer's paths, for find -name
+        self.names = NameIndex()
+        if base is None:
+            self._register("/", self._allocate("", None, {}))
+            for path in ("/home", "/home/commander", "/home/guest", "/etc", "/bin", "/var", "/var/logs", "/logs"):
+                self.mkdir(path)
+            self.write("/etc/config.txt", "system config")
+
+    def _allocate(self, name: str, parent: Optional[Inode], children: Optional[Dict[str, Inode]] = None,
+                  data: str = "") -> Inode:
+        if self.free_inodes:
+            ino = self.free_inodes.pop()
+            node = self.inodes[ino] = Inode(ino, name, parent, children, data)
+        else:
+            node = Inode(len(self.inodes), name, parent, children, data)
+            self.inodes.append(node)
+        if children is None:
+            self.index.update(node)
+        return node
+
+    def _owns(self, node: Inode) -> bool:
+        return node.ino < len(self.inodes) and self.inodes[node.ino] is node
+
+    def _writable(self, abs_path: str, node: Inode) -> Inode:
+        # Copy-up: directories copy only their entry table, not the subtree
+        if self._owns(node):
+            return node
+        copy = self._allocate(node.name, node.parent, dict(node.children) if node.is_dir else None, node.data)
+        self._register(abs_path, copy)
+        return copy
+
+    def _register(self, path: str, node: Inode):
+        self.paths[path] = node
+        self.names.add(path)
+        self.whiteouts.discard(path)
+
+    def _unregister(self, path: str):
+        if self.paths.pop(path, None) is not None:
+            self.names.discard(path)
+        if self.base is not None and self.base.lookup(path) is not None:
+            self.whiteouts.add(path)
 
     def get_absolute_path(self, path: str) -> str:
+        if path == "~" or path.startswith("~/"):
+            path = HOME + path[1:]
         if path.startswith("/"):
             return path
         else:
-            return os.path.join(self.current_path, path)
+            return posixpath.join(self.current_path, path)
 
     def normalize_path(self, path: str) -> str:
-        return os.path.normpath(path)
+        path = posixpath.normpath(path)
+        # normpath keeps a leading "//"
+        return "/" + path.lstrip("/")
+
+    def abspath(self, path: str) -> str:
+        return self.normalize_path(self.get_absolute_path(path))
+
+    def lookup(self, abs_path: str) -> Optional[Inode]:
+        node = self.paths.get(abs_path)
+        if node is None and self.base is not None and abs_path not in self.whiteouts:
+            node = self.base.lookup(abs_path)
+        return node
+
+    def resolve(self, path: str) -> Optional[Inode]:
+        return self.lookup(self.abspath(path))
+
+    def walk(self, path: str, node: Optional[Inode] = None, maxdepth: Optional[int] = None,
+             cancellable: bool = True) -> Iterator[Tuple[str, Inode]]:
+        # Every (path, inode) under path, parents before children. A
+        # cancelled command stops at the next node unless the caller is
+        # already part way through changing the tree.
+        stack = [(path, node if node is not None else self.lookup(path), 0)]
+        while stack:
+            if cancellable:
+                checkpoint()
+            path, node, depth = stack.pop()
+            yield path, node
+            if node.children and (maxdepth is None or depth < maxdepth):
+                prefix = path.rstrip("/") + "/"
+                for name in reversed(list(node.children)):
+                    stack.append((prefix + name, self.lookup(prefix + name), depth + 1))
+
+    def _detach(self, abs_path: str, cancellable: bool = True) -> List[Tuple[str, Inode]]:
+        # Unlinks the subtree at abs_path; returns its (relative path, inode)
+        # entries. The subtree is collected before anything changes.
+        entries = [(relative(path, abs_path), node) for path, node in self.walk(abs_path, cancellable=cancellable)]
+        parent_path, name = posixpath.split(abs_path)
+        parent = self._writable(parent_path, self.lookup(parent_path))
+        del parent.children[name]
+        for rel, _ in entries:
+            self._unregister(abs_path + rel)
+        return entries
+
+    def _attach(self, parent_path: str, name: str, entries: List[Tuple[str, Inode]]):
+        parent = self._writable(parent_path, self.lookup(parent_path))
+        dest = parent_path.rstrip("/") + "/" + name
+        top = entries[0][1]
+        if not self._owns(top):
+            top = self._allocate(name, parent, dict(top.children) if top.is_dir else None, top.data)
+        top.name = name
+        top.parent = parent
+        parent.children[name] = top
+        self._register(dest, top)
+        for rel, node in entries[1:]:
+            self._register(dest + rel, node)
+
+    def _free(self, node: Inode):
+        if self._owns(node):
+            self.inodes[node.ino] = None
+            self.free_inodes.append(node.ino)
+            self.index.discard(node)
+
+    def _release(self, abs_path: str, cancellable: bool = True):
+        for _, node in self._detach(abs_path, cancellable):
+            self._free(node)
+
+    def _copy(self, abs_path: str) -> List[Tuple[str, Inode]]:
+        entries: List[Tuple[str, Inode]] = []
+        copies: Dict[str, Inode] = {}
+        try:
+            for path, node in self.walk(abs_path):
+                rel = relative(path, abs_path)
+                parent_rel, _, name = rel.rpartition("/")
+                copy = self._allocate(name, None, {} if node.is_dir else None, node.data)
+                if rel:
+                    copy.parent = copies[parent_rel]
+                    copy.parent.children[name] = copy
+                copies[rel] = copy
+                entries.append((rel, copy))
+        except CommandCancelled:
+            # The copies are not linked anywhere yet
+            for _, copy in entries:
+                self._free(copy)
+            raise
+        return entries
+
+    def _parent_dir(self, abs_path: str) -> Tuple[Optional[Inode], str, str]:
+        parent_path, name = posixpath.split(abs_path)
+        parent = self.lookup(parent_path)
+        if parent is None or not parent.is_dir:
+            return None, parent_path, name
+        return parent, parent_path, name
+
+    def _create(self, abs_path: str, children: Optional[Dict[str, Inode]] = None, data: str = "") -> bool:
+        parent, parent_path, name = self._parent_dir(abs_path)
+        if parent is None or not name:
+            return False
+        self._attach(parent_path, name, [("", self._allocate(name, None, children, data))])
+        return True
+
+    def stats(self) -> Dict:
+        # What this filesystem holds beyond its base image
+        return {
+            "paths": len(self.paths),
+            "whiteouts": len(self.whiteouts),
+            "inodes": len(self.inodes) - len(self.free_inodes),
+        }
 
-    def ls(self, path: str = None) -> List[str]:
-        if path is None:
-            path = self.current_path
-        abs_path = self.get_absolute_path(path)
-        abs_path = self.normalize_path(abs_path)
-
-        # Navigate to the directory
-        parts = abs_path.split("/")
-        current = self.filesystem
-        for part in parts:
-            if part == "":
+    def memory_usage(self) -> Dict:
+        # Rough heap footprint of this layer (not its base): inodes, their
+        # names and text, the path maps and both indexes. Snapshot content not
+        # decoded yet lives in a file mapping and is counted apart.
+        nodes = text = mapped = 0
+        for node in list(self.inodes):
+            if node is None:
                 continue
-            if part in current:
-                current = current[part]
+            nodes += sys.getsizeof(node) + sys.getsizeof(node.name)
+            if node.is_dir:
+                nodes += sys.getsizeof(node.children)
+            elif isinstance(node.data, str):
+                text += sys.getsizeof(node.data)
             else:
-                return []
+                mapped += node.data.length
+        paths = sys.getsizeof(self.paths) + sys.getsizeof(self.whiteouts) + \
+            sum(sys.getsizeof(path) for path in list(self.paths) + list(self.whiteouts))
+        index = sys.getsizeof(self.index.postings) + sum(sys.getsizeof(grams) for grams in list(self.index.indexed.values()))
+        names = sys.getsizeof(self.names.names) + sys.getsizeof(self.names.sorted_names) * 2
+        return {
+            "nodes": nodes,
+            "text": text,
+            "paths": paths,
+            "index": index + names,
+            "mapped": mapped,
+            "total": nodes + text + paths + index + names,
+        }
 
-        # List contents
-        if isinstance(current, dict):
-            return list(current.keys())
+    def ls(self, path: str = None) -> List[str]:
+        if path is None:
+            path = self.current_path
+        abs_path = self.abspath(path)
+        node = self.lookup(abs_path)
+        if node is None:
+            return []
+        if node.is_dir:
+            return list(node.children)
         else:
             return [abs_path]
 
-    def cd(self, path: str) -> str:
-        if path == "~":
-            path = "/home/commander"
-        abs_path = self.get_absolute_path(path)
-        abs_path = self.normalize_path(abs_path)
-
-        # Check if directory exists
-        parts = abs_path.split("/")
-        current = self.filesystem
-        for part in parts:
-            if part == "":
-                continue
-            if part in current and isinstance(current[part], dict):
-                current = current[part]
-            else:
-                return f"cd: {path}: No such file or directory"
-
+    def cd(self, path: str = "~") -> str:
+        abs_path = self.abspath(path)
+        node = self.lookup(abs_path)
+        if node is None or not node.is_dir:
+            return f"cd: {path}: No such file or directory"
         self.current_path = abs_path
         return ""
 
@@ -71,287 +279,194 @@ class VirtualFileSystem:
         return self.current_path
 
     def mkdir(self, path: str) -> str:
-        abs_path = self.get_absolute_path(path)
-        abs_path = self.normalize_path(abs_path)
-
-        parts = abs_path.split("/")
-        current = self.filesystem
-        for i, part in enumerate(parts):
-            if part == "":
-                continue
-            if part not in current:
-                if i == len(parts) - 1:
-                    current[part] = {}
-                else:
-                    return f"mkdir: cannot create directory '{path}': No such file or directory"
-            else:
-                if not isinstance(current[part], dict):
-                    return f"mkdir: cannot create directory '{path}': Not a directory"
-            current = current[part]
+        abs_path = self.abspath(path)
+        existing = self.lookup(abs_path)
+        if existing is not None:
+            if not existing.is_dir:
+                return f"mkdir: cannot create directory '{path}': Not a directory"
+            return ""
+        if not self._create(abs_path, {}):
+            return f"mkdir: cannot create directory '{path}': No such file or directory"
         return ""
 
     def rmdir(self, path: str) -> str:
-        abs_path = self.get_absolute_path(path)
-        abs_path = self.normalize_path(abs_path)
-
+        abs_path = self.abspath(path)
         if abs_path == "/":
             return "rmdir: cannot remove root directory"
-
-        parts = abs_path.split("/")
-        current = self.filesystem
-        for i, part in enumerate(parts):
-            if part == "":
-                continue
-            if part in current:
-                if i == len(parts) - 1:
-                    if isinstance(current[part], dict) and not current[part]:
-                        del current[part]
-                    else:
-                        return f"rmdir: failed to remove '{path}': Directory not empty"
-                else:
-                    current = current[part]
-            else:
-                return f"rmdir: failed to remove '{path}': No such file or directory"
+        node = self.lookup(abs_path)
+        if node is None:
+            return f"rmdir: failed to remove '{path}': No such file or directory"
+        if not node.is_dir:
+            return f"rmdir: failed to remove '{path}': Not a directory"
+        if node.children:
+            return f"rmdir: failed to remove '{path}': Directory not empty"
+        self._release(abs_path)
         return ""
 
     def touch(self, path: str) -> str:
-        abs_path = self.get_absolute_path(path)
-        abs_path = self.normalize_path(abs_path)
-
-        parts = abs_path.split("/")
-        filename = parts[-1]
-        dir_parts = parts[:-1]
-
-        current = self.filesystem
-        for part in dir_parts:
-            if part == "":
-                continue
-            if part not in current:
-                return f"touch: cannot touch '{path}': No such file or directory"
-            current = current[part]
-
-        current[filename] = ""
+        abs_path = self.abspath(path)
+        if self.lookup(abs_path) is None and not self._create(abs_path):
+            return f"touch: cannot touch '{path}': No such file or directory"
         return ""
 
     def rm(self, path: str) -> str:
-        abs_path = self.get_absolute_path(path)
-        abs_path = self.normalize_path(abs_path)
-
-        parts = abs_path.split("/")
-        filename = parts[-1]
-        dir_parts = parts[:-1]
-
-        current = self.filesystem
-        for part in dir_parts:
-            if part == "":
-                continue
-            if part in current:
-                current = current[part]
-            else:
-                return f"rm: cannot remove '{path}': No such file or directory"
-
-        if filename in current:
-            del current[filename]
-        else:
+        abs_path = self.abspath(path)
+        if abs_path == "/" or self.lookup(abs_path) is None:
             return f"rm: cannot remove '{path}': No such file or directory"
+        self._release(abs_path)
         return ""
 
     def cat(self, path: str) -> str:
-        abs_path = self.get_absolute_path(path)
-        abs_path = self.normalize_path(abs_path)
-
-        parts = abs_path.split("/")
-        current = self.filesystem
-        for part in parts:
-            if part == "":
-                continue
-            if part in current:
-                current = current[part]
-            else:
-                return f"cat: {path}: No such file or directory"
-
-        if isinstance(current, dict):
+        node = self.resolve(path)
+        if node is None:
+            return f"cat: {path}: No such file or directory"
+        if node.is_dir:
             return f"cat: {path}: Is a directory"
         else:
-            return current
+            return node.text
+
+    def write(self, path: str, text: str, append: bool = False, command: str = "echo") -> str:
+        abs_path = self.abspath(path)
+        node = self.lookup(abs_path)
+        if node is not None:
+            if node.is_dir:
+                return f"{command}: cannot write to '{path}': Is a directory"
+            node = self._writable(abs_path, node)
+            node.data = node.text + "\n" + text if append and node.text else text
+            self.index.update(node)
+        elif not self._create(abs_path, data=text):
+            return f"{command}: cannot write to '{path}': No such file or directory"
+        return ""
 
-    def echo(self, text: str, path: str = None) -> str:
-        if path is None:
-            return text
-        else:
-            abs_path = self.get_absolute_path(path)
-            abs_path = self.normalize_path(abs_path)
-
-            parts = abs_path.split("/")
-            filename = parts[-1]
-            dir_parts = parts[:-1]
-
-            current = self.filesystem
-            for part in dir_parts:
-                if part == "":
-                    continue
-                if part in current:
-                    current = current[part]
-                else:
-                    return f"echo: cannot write to '{path}': No such file or directory"
-
-            current[filename] = text
-            return ""
+    def _destination(self, src_abs: str, dst: str) -> Tuple[Optional[Inode], str, str]:
+        # Into an existing directory keeps the source name; otherwise dst names the new entry
+        dst_abs = self.abspath(dst)
+        dst_node = self.lookup(dst_abs)
+        if dst_node is not None and dst_node.is_dir:
+            return dst_node, dst_abs, posixpath.basename(src_abs)
+        return self._parent_dir(dst_abs)
 
     def cp(self, src: str, dst: str) -> str:
-        src_abs = self.get_absolute_path(src)
-        src_abs = self.normalize_path(src_abs)
-        dst_abs = self.get_absolute_path(dst)
-        dst_abs = self.normalize_path(dst_abs)
-
-        # Get source content
-        src_parts = src_abs.split("/")
-        current = self.filesystem
-        for part in src_parts:
-            if part == "":
-                continue
-            if part in current:
-                current = current[part]
-            else:
-                return f"cp: cannot stat '{src}': No such file or directory"
-        src_content = current
-
-        # Get destination directory
-        dst_parts = dst_abs.split("/")
-        dst_dir = self.filesystem
-        for part in dst_parts:
-            if part == "":
-                continue
-            if part in dst_dir:
-                dst_dir = dst_dir[part]
-            else:
-                # Assume the last part is the new file name
-                pass
-
-        # If dst is a directory, use the same filename
-        if isinstance(dst_dir, dict):
-            dst_dir[src_parts[-1]] = src_content
-        else:
-            # Overwrite the file
-            pass  # This is a simplification, we assume dst is a file path
-
+        src_abs = self.abspath(src)
+        src_node = self.lookup(src_abs)
+        if src_node is None:
+            return f"cp: cannot stat '{src}': No such file or directory"
+        parent, parent_path, name = self._destination(src_abs, dst)
+        if parent is None:
+            return f"cp: cannot create '{dst}': No such file or directory"
+        dst_abs = parent_path.rstrip("/") + "/" + name
+        if dst_abs == src_abs:
+            return f"cp: '{src}' and '{dst}' are the same file"
+        if is_within(dst_abs, src_abs):
+            return f"cp: cannot copy '{src}' into itself"
+        entries = self._copy(src_abs)
+        if name in parent.children:
+            self._release(dst_abs, cancellable=False)
+        self._attach(parent_path, name, entries)
         return ""
 
     def mv(self, src: str, dst: str) -> str:
-        # For simplicity, we do cp and then rm
-        result = self.cp(src, dst)
-        if result:
-            return result
-        return self.rm(src)
-
-    def grep(self, pattern: str, path: str) -> str:
-        content = self.cat(path)
-        if content.startswith("grep:"):
-            return content
-        lines = content.split("\n")
-        result = [line for line in lines if pattern in line]
-        return "\n".join(result)
-
-    def find(self, path: str, name: str) -> str:
-        # This is a simplified version
-        abs_path = self.get_absolute_path(path)
-        abs_path = self.normalize_path(abs_path)
-
-        def _find(current, current_path, results):
-            for key, value in current.items():
-                full_path = os.path.join(current_path, key)
-                if key == name:
-                    results.append(full_path)
-                if isinstance(value, dict):
-                    _find(value, full_path, results)
-
-        results = []
-        parts = abs_path.split("/")
-        current = self.filesystem
-        for part in parts:
-            if part == "":
+        src_abs = self.abspath(src)
+        src_node = self.lookup(src_abs)
+        if src_node is None or src_abs == "/":
+            return f"mv: cannot stat '{src}': No such file or directory"
+        parent, parent_path, name = self._destination(src_abs, dst)
+        if parent is None:
+            return f"mv: cannot move '{src}' to '{dst}': No such file or directory"
+        dst_abs = parent_path.rstrip("/") + "/" + name
+        if dst_abs == src_abs:
+            return ""
+        if is_within(dst_abs, src_abs):
+            return f"mv: cannot move '{src}' to a subdirectory of itself"
+        # Relinking updates O(subtree) paths; no file data is copied
+        if name in parent.children:
+            self._release(dst_abs)
+        self._attach(parent_path, name, self._detach(src_abs, cancellable=False))
+        if is_within(self.current_path, src_abs):
+            self.current_path = dst_abs + self.current_path[len(src_abs):]
+        return ""
+
+    def find(self, path: str, name: Optional[str] = None, kind: Optional[str] = None,
+             maxdepth: Optional[int] = None) -> str:
+        abs_path = self.abspath(path)
+        if self.lookup(abs_path) is None:
+            return f"find: '{path}': No such file or directory"
+        return "\n".join(self.find_paths(abs_path, name, kind, maxdepth))
+
+    def find_paths(self, abs_path: str, name: Optional[str] = None, kind: Optional[str] = None,
+                   maxdepth: Optional[int] = None) -> Iterator[str]:
+        # Paths under abs_path (itself included) filtered like find(1); with a
+        # name glob the candidates come from the name indexes, not a walk
+        prefix = abs_path.rstrip("/") + "/"
+        if name is None:
+            candidates = (path for path, _ in self.walk(abs_path, maxdepth=maxdepth))
+        else:
+            candidates = sorted(path for path in self._named(name) if path == abs_path or path.startswith(prefix))
+        for path in candidates:
+            if maxdepth is not None and path != abs_path and path.count("/", len(prefix)) >= maxdepth:
                 continue
-            if part in current:
-                current = current[part]
-            else:
-                return f"find: '{path}': No such file or directory"
+            if kind is not None and (kind == "d") != self.lookup(path).is_dir:
+                continue
+            yield path
 
-        _find(current, abs_path, results)
-        return "\n".join(results)
+    def _named(self, pattern: str) -> Set[str]:
+        found = set(self.names.paths(pattern))
+        if self.base is not None:
+            found.update(path for path in self.base._named(pattern) if path not in self.whiteouts)
+        return found
+
+# Shared, read-only base image every terminal session overlays. Its content
+# index is built up front so concurrent sessions only ever read it.
+BASE_IMAGE = VirtualFileSystem()
+BASE_IMAGE.index.refresh()
 
 class TerminalEngine:
-    def __init__(self):
-        self.vfs = VirtualFileSystem()
-        self.history = []
+    def __init__(self, base: Optional[VirtualFileSystem] = BASE_IMAGE):
+        self.vfs = VirtualFileSystem(base)
+        self.history = deque(maxlen=TERMINAL_HISTORY_SIZE)
+        # Bumped by every command; lets the snapshot writer skip idle sessions
+        self.generation = 0
+        # Held while a command runs or a snapshot is taken
+        self.lock = threading.Lock()
+
+    def prompt(self) -> str:
+        cwd = self.vfs.current_path
+        if cwd == HOME or cwd.startswith(HOME + "/"):
+            cwd = "~" + cwd[len(HOME):]
+        return f"\x1b[32mcommander@aurora-x:{cwd}$\x1b[0m "
+
+    def memory_usage(self) -> Dict:
+        usage = self.vfs.memory_usage()
+        history = sys.getsizeof(self.history) + sum(sys.getsizeof(command) for command in list(self.history))
+        usage["history"] = history
+        usage["total"] += history
+        return usage
 
     def process_command(self, command: str) -> str:
-        self.history.append(command)
-        parts = shlex.split(command)
-        if not parts:
-            return ""
+        return "\n".join(self.stream(command))
 
-        cmd = parts[0]
-        args = parts[1:]
-
-        if cmd == "ls":
-            return "\n".join(self.vfs.ls(*args))
-        elif cmd == "cd":
-            return self.vfs.cd(*args)
-        elif cmd == "pwd":
-            return self.vfs.pwd()
-        elif cmd == "mkdir":
-            return self.vfs.mkdir(*args)
-        elif cmd == "rmdir":
-            return self.vfs.rmdir(*args)
-        elif cmd == "touch":
-            return self.vfs.touch(*args)
-        elif cmd == "rm":
-            return self.vfs.rm(*args)
-        elif cmd == "cat":
-            return self.vfs.cat(*args)
-        elif cmd == "echo":
-            if len(args) == 0:
-                return ""
-            elif len(args) == 1:
-                return self.vfs.echo(args[0])
-            else:
-                # Assume the last argument is the file
-                text = " ".join(args[:-1])
-                return self.vfs.echo(text, args[-1])
-        elif cmd == "cp":
-            if len(args) != 2:
-                return "cp: missing file operand"
-            return self.vfs.cp(args[0], args[1])
-        elif cmd == "mv":
-            if len(args) != 2:
-                return "mv: missing file operand"
-            return self.vfs.mv(args[0], args[1])
-        elif cmd == "grep":
-            if len(args) != 2:
-                return "grep: missing pattern or file"
-            return self.vfs.grep(args[0], args[1])
-        elif cmd == "find":
-            if len(args) != 2:
-                return "find: missing path or name"
-            return self.vfs.find(args[0], args[1])
-        elif cmd == "clear":
-            return "\033[2J\033[H"  # ANSI escape codes to clear screen
-        elif cmd == "whoami":
-            return "commander"
-        elif cmd == "date":
-            from datetime import datetime
-            return datetime.now().strftime("%a %b %d %H:%M:%S %Z %Y")
-        elif cmd == "uname":
-            return "Linux aurora-x 5.10.0-aurora #1 SMP Fri Jan 1 00:00:00 UTC 2021 x86_64 GNU/Linux"
-        elif cmd == "history":
-            return "\n".join([f"{i+1}  {cmd}" for i, cmd in enumerate(self.history[-10:])])
-        elif cmd == "help":
-            return """Available commands:
-ls, cd, pwd, mkdir, rmdir, touch, rm, cat, echo, cp, mv, grep, find,
-clear, whoami, date, uname, history, help
-"""
-        else:
-            return f"{cmd}: command not found"
+    def stream(self, command: str) -> Iterator[str]:
+        # Output lines as the last pipeline stage produces them
+        self.history.append(command)
+        self.generation += 1
+        try:
+            stages = parse_pipeline(command)
+            lines: Optional[Iterator[str]] = None
+            for stage in stages:
+                lines = stage.command.handler(self, stage.args, lines)
+                if stage.redirect is not None:
+                    lines = self._redirect(lines, *stage.redirect)
+            if lines is not None:
+                yield from lines
+        except CommandError as exc:
+            yield str(exc)
+
+    def _redirect(self, lines: Iterator[str], operator: str, path: str) -> Iterator[str]:
+        result = self.vfs.write(path, "\n".join(lines), append=operator == ">>", command="aurora")
+        if result:
+            raise CommandError(result)
+        return
+        yield
 
 # Example usage:
 if __name__ == "__main__":
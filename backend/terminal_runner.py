@@ -0,0 +1,223 @@
+# backend/terminal_runner.py
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Awaitable, Callable, List, Optional
+
+from .terminal_commands import CommandCancelled, cancellable
+from .terminal_engine import TerminalEngine
+
+logger = logging.getLogger(__name__)
+
+# Worker threads shared by every terminal session
+TERMINAL_WORKERS = int(os.getenv("AURORA_TERMINAL_WORKERS", "4"))
+# Commands allowed to wait for a worker before new ones are refused
+TERMINAL_MAX_PENDING = int(os.getenv("AURORA_TERMINAL_MAX_PENDING", "32"))
+# Seconds a command may run before it is stopped
+TERMINAL_COMMAND_TIMEOUT = float(os.getenv("AURORA_TERMINAL_COMMAND_TIMEOUT", "10"))
+# Seconds a cancelled command gets to reach a checkpoint before its worker is written off
+TERMINAL_CANCEL_GRACE = float(os.getenv("AURORA_TERMINAL_CANCEL_GRACE", "2"))
+# Output is sent once a chunk reaches this many bytes or has waited this long (seconds)
+TERMINAL_CHUNK_BYTES = int(os.getenv("AURORA_TERMINAL_CHUNK_BYTES", "16384"))
+TERMINAL_CHUNK_INTERVAL = float(os.getenv("AURORA_TERMINAL_CHUNK_INTERVAL", "0.05"))
+
+# Sent by terminal.js for Ctrl-C
+INTERRUPT = "\x03"
+
+# How a command ended
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+CLOSED = "closed"
+BUSY = "busy"
+FAILED = "failed"
+
+Send = Callable[[str], Awaitable[bool]]
+
+class TerminalRunner:
+    # Runs terminal commands on a bounded thread pool so a slow find/grep/cp
+    # never blocks the event loop. A command's output lines are batched into
+    # chunks and handed back to the loop as they are produced; the send
+    # awaits the connection's queue, so a slow client also slows the worker.
+    # Cancellation is cooperative: the worker checks its event between output
+    # lines and at checkpoints inside long walks and reads. A worker that
+    # still has not stopped after the grace period is abandoned along with
+    # its pool, so it cannot starve the other sessions.
+    def __init__(self, workers: int = TERMINAL_WORKERS, max_pending: int = TERMINAL_MAX_PENDING,
+                 timeout: float = TERMINAL_COMMAND_TIMEOUT, chunk_bytes: int = TERMINAL_CHUNK_BYTES,
+                 chunk_interval: float = TERMINAL_CHUNK_INTERVAL, grace: float = TERMINAL_CANCEL_GRACE):
+        self.workers = max(1, workers)
+        self.max_pending = max(0, max_pending)
+        self.timeout = timeout
+        self.grace = grace
+        self.chunk_bytes = chunk_bytes
+        self.chunk_interval = chunk_interval
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="terminal")
+        self.in_flight = 0
+        self.abandoned = 0
+        self.outcomes = {COMPLETED: 0, CANCELLED: 0, TIMED_OUT: 0, CLOSED: 0, BUSY: 0, FAILED: 0}
+
+    async def run(self, engine: TerminalEngine, command: str, send: Send, cancel: threading.Event) -> str:
+        if self.in_flight >= self.workers + self.max_pending:
+            self.outcomes[BUSY] += 1
+            return BUSY
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        try:
+            future = loop.run_in_executor(self.pool, self._execute, loop, engine, command, send, cancel)
+            try:
+                outcome = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+            except asyncio.TimeoutError:
+                # Stop the worker at its next checkpoint and wait for it to let go of the session
+                cancel.set()
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), self.grace)
+                except asyncio.TimeoutError:
+                    self._abandon(command)
+                outcome = TIMED_OUT
+        finally:
+            self.in_flight -= 1
+        self.outcomes[outcome] += 1
+        return outcome
+
+    def _abandon(self, command: str):
+        # The stuck worker keeps the old pool; new commands get fresh threads.
+        # Its session stays locked (and busy) until the command returns.
+        logger.warning("terminal command did not stop after cancel, abandoning its worker: %.80s", command)
+        self.abandoned += 1
+        pool, self.pool = self.pool, ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="terminal")
+        pool.shutdown(wait=False)
+
+    def _execute(self, loop, engine: TerminalEngine, command: str, send: Send, cancel: threading.Event) -> str:
+        def emit(lines: List[str]) -> bool:
+            text = "".join("\n" + line for line in lines)
+            sent = asyncio.run_coroutine_threadsafe(send(text), loop)
+            # A send blocked on a slow client still gives way to Ctrl-C
+            while True:
+                try:
+                    return sent.result(timeout=0.1)
+                except FutureTimeoutError:
+                    if cancel.is_set() or loop.is_closed():
+                        sent.cancel()
+                        return False
+
+        # The engine lock serializes this session's commands and snapshots; it
+        # is only still held here when an abandoned command is running on
+        if not engine.lock.acquire(timeout=self.grace):
+            return BUSY
+        try:
+            lines = engine.stream(command)
+            chunk: List[str] = []
+            size = 0
+            flushed = time.monotonic()
+            try:
+                with cancellable(cancel):
+                    for line in lines:
+                        if cancel.is_set():
+                            return CANCELLED
+                        chunk.append(line)
+                        size += len(line) + 1
+                        now = time.monotonic()
+                        if size >= self.chunk_bytes or now - flushed >= self.chunk_interval:
+                            if not emit(chunk):
+                                return CANCELLED if cancel.is_set() else CLOSED
+                            chunk, size, flushed = [], 0, now
+                if cancel.is_set():
+                    return CANCELLED
+                if chunk and not emit(chunk):
+                    return CANCELLED if cancel.is_set() else CLOSED
+                return COMPLETED
+            except CommandCancelled:
+                return CANCELLED
+            finally:
+                lines.close()
+        except Exception:
+            logger.exception("terminal command failed: %.80s", command)
+            return FAILED
+        finally:
+            engine.lock.release()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "max_pending": self.max_pending,
+            "timeout": self.timeout,
+            "abandoned": self.abandoned,
+            "outcomes": dict(self.outcomes),
+        }
+
+terminal_runner = TerminalRunner()
+
+class TerminalSession:
+    # One terminal WebSocket: commands run one at a time in arrival order, and
+    # Ctrl-C stops the running command and discards any typed ahead of it
+    def __init__(self, engine: TerminalEngine, send: Send, runner: TerminalRunner = terminal_runner):
+        self.engine = engine
+        self.send = send
+        self.runner = runner
+        self.commands: asyncio.Queue = asyncio.Queue()
+        self.cancel: Optional[threading.Event] = None
+        self._task = asyncio.create_task(self._run())
+
+    async def receive(self, message: str):
+        if message == INTERRUPT:
+            await self.interrupt()
+        else:
+            self.commands.put_nowait(message)
+
+    async def interrupt(self):
+        while not self.commands.empty():
+            self.commands.get_nowait()
+        if self.cancel is not None:
+            self.cancel.set()
+        else:
+            await self.send(self.prompt())
+
+    def prompt(self) -> str:
+        return "\n" + self.engine.prompt()
+
+    async def _run(self):
+        while True:
+            command = await self.commands.get()
+            self.cancel = threading.Event()
+            try:
+                outcome = await self.runner.run(self.engine, command, self.send, self.cancel)
+            except Exception:
+                logger.exception("terminal session could not run: %.80s", command)
+                outcome = FAILED
+            finally:
+                self.cancel = None
+            if outcome == CLOSED:
+                return
+            if outcome == TIMED_OUT:
+                notice = f"\naurora: command timed out after {self.runner.timeout:g}s"
+            elif outcome == BUSY:
+                notice = "\naurora: terminal busy, try again"
+            elif outcome == FAILED:
+                notice = "\naurora: command failed"
+            else:
+                notice = ""
+            if not await self.send(notice + self.prompt()):
+                return
+
+    async def close(self):
+        # The socket is gone: stop the running command; the worker releases
+        # the session at its next line
+        while not self.commands.empty():
+            self.commands.get_nowait()
+        if self.cancel is not None:
+            self.cancel.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
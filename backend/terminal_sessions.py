@@ -0,0 +1,189 @@
+# backend/terminal_sessions.py
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .terminal_engine import BASE_IMAGE, TerminalEngine
+from .websocket import ClientConnection
+
+logger = logging.getLogger(__name__)
+
+# Terminal sessions held in memory at once; opening one more evicts the least recently used
+TERMINAL_MAX_SESSIONS = int(os.getenv("AURORA_TERMINAL_MAX_SESSIONS", "64"))
+# Seconds without input before a session is closed (its snapshot keeps it resumable)
+TERMINAL_IDLE_TIMEOUT = float(os.getenv("AURORA_TERMINAL_IDLE_TIMEOUT", "1800"))
+# Estimated bytes all sessions may hold before the least recently used are evicted
+TERMINAL_MEMORY_BUDGET = int(os.getenv("AURORA_TERMINAL_MEMORY_BUDGET", str(256 * 1024 * 1024)))
+# Seconds between passes that re-estimate memory and close idle sessions
+TERMINAL_SWEEP_INTERVAL = float(os.getenv("AURORA_TERMINAL_SWEEP_INTERVAL", "30"))
+
+# Close code for a session the server evicted; terminal.js waits for a key
+# press before reconnecting instead of retrying on its own
+WS_CLOSE_EVICTED = 4000
+
+# Why a session was evicted
+IDLE = "idle"
+CAPACITY = "capacity"
+MEMORY = "memory"
+REPLACED = "replaced"
+
+class ManagedSession:
+    __slots__ = ("session_id", "engine", "connection", "task", "user", "opened", "last_active", "memory", "closed")
+
+    def __init__(self, session_id: str, engine: TerminalEngine, connection: ClientConnection, user: dict):
+        self.session_id = session_id
+        self.engine = engine
+        self.connection = connection
+        # Reads the socket for the WebSocket handler; cancelling it ends the session
+        self.task: Optional[asyncio.Task] = None
+        self.user = user
+        self.opened = self.last_active = time.monotonic()
+        # Last estimate from memory_usage(), refreshed by the sweep
+        self.memory: Dict = {"total": 0}
+        # Set once the handler has finished cleaning up, final snapshot included
+        self.closed = asyncio.Event()
+
+    @property
+    def busy(self) -> bool:
+        return self.engine.lock.locked()
+
+class TerminalSessionManager:
+    # Every open terminal session in least- to most-recently-used order.
+    # Sessions are closed when idle too long, when a new one would pass the
+    # cap, or when their estimated memory passes the budget; an evicted
+    # session's snapshot is written on the way out, so its tab resumes it
+    # on reconnect.
+    def __init__(self, max_sessions: int = TERMINAL_MAX_SESSIONS, idle_timeout: float = TERMINAL_IDLE_TIMEOUT,
+                 memory_budget: int = TERMINAL_MEMORY_BUDGET, interval: float = TERMINAL_SWEEP_INTERVAL):
+        self.max_sessions = max(1, max_sessions)
+        self.idle_timeout = idle_timeout
+        self.memory_budget = memory_budget
+        self.interval = interval
+        self.sessions: "OrderedDict[str, ManagedSession]" = OrderedDict()
+        self.opened = 0
+        self.evictions = {IDLE: 0, CAPACITY: 0, MEMORY: 0, REPLACED: 0}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def close(self, session_id: str, user: dict):
+        # Hands a session id over to a new socket of the same user (a
+        # reconnect, or a duplicated tab): the old one is closed and has
+        # written its final snapshot before the new one restores it. Raises
+        # PermissionError when the session belongs to someone else.
+        previous = self.sessions.get(session_id)
+        if previous is not None:
+            if previous.user["username"] != user["username"]:
+                raise PermissionError(f"terminal session {session_id} belongs to another user")
+            await self.evict(previous, REPLACED)
+            await previous.closed.wait()
+
+    async def open(self, session_id: str, engine: TerminalEngine, connection: ClientConnection,
+                   user: dict) -> ManagedSession:
+        # Called from the session's WebSocket handler, after close()
+        previous = self.sessions.get(session_id)
+        if previous is not None:
+            await self.evict(previous, REPLACED)
+        while len(self.sessions) >= self.max_sessions:
+            await self.evict(self._least_recent(), CAPACITY)
+        session = ManagedSession(session_id, engine, connection, user)
+        self.sessions[session_id] = session
+        self.opened += 1
+        return session
+
+    def touch(self, session: ManagedSession):
+        session.last_active = time.monotonic()
+        if self.sessions.get(session.session_id) is session:
+            self.sessions.move_to_end(session.session_id)
+
+    def remove(self, session: ManagedSession):
+        if self.sessions.get(session.session_id) is session:
+            del self.sessions[session.session_id]
+        session.closed.set()
+
+    def _least_recent(self) -> ManagedSession:
+        # Sessions running a command are passed over while any other is left
+        for session in self.sessions.values():
+            if not session.busy:
+                return session
+        return next(iter(self.sessions.values()))
+
+    async def evict(self, session: ManagedSession, reason: str):
+        if self.sessions.get(session.session_id) is not session:
+            return
+        del self.sessions[session.session_id]
+        self.evictions[reason] += 1
+        logger.info("evicting terminal session %s (%s)", session.session_id, reason)
+        await session.connection.close(WS_CLOSE_EVICTED)
+        # A half-open socket never reports the close, so stop the handler directly
+        if session.task is not None and session.task is not asyncio.current_task():
+            session.task.cancel()
+
+    async def sweep(self):
+        now = time.monotonic()
+        if self.idle_timeout:
+            for session in list(self.sessions.values()):
+                if now - session.last_active > self.idle_timeout and not session.busy:
+                    await self.evict(session, IDLE)
+        for session in list(self.sessions.values()):
+            session.memory = await asyncio.to_thread(self._measure, session.engine)
+        while self.memory_budget and len(self.sessions) > 1 and self.memory_total() > self.memory_budget:
+            await self.evict(self._least_recent(), MEMORY)
+
+    def _measure(self, engine: TerminalEngine) -> Dict:
+        # Taken between commands, like a snapshot
+        with engine.lock:
+            return engine.memory_usage()
+
+    def memory_total(self) -> int:
+        return sum(session.memory["total"] for session in self.sessions.values())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("terminal session sweep failed")
+
+    def describe(self) -> List[dict]:
+        now = time.monotonic()
+        return [{
+            "user": session.user["username"],
+            "age": round(now - session.opened, 1),
+            "idle": round(now - session.last_active, 1),
+            "busy": session.busy,
+            "commands": session.engine.generation,
+            "history": len(session.engine.history),
+            "filesystem": session.engine.vfs.stats(),
+            "memory": session.memory,
+        } for session in reversed(self.sessions.values())]
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "memory_budget": self.memory_budget,
+            "memory_estimate": self.memory_total(),
+            "base_image": BASE_IMAGE.stats(),
+            "opened": self.opened,
+            "evictions": dict(self.evictions),
+        }
+
+terminal_sessions = TerminalSessionManager()
@@ -0,0 +1,299 @@
+# backend/terminal_snapshots.py
+
+import asyncio
+import logging
+import mmap
+import os
+import posixpath
+import re
+import struct
+import time
+from typing import Dict, Optional, Tuple
+
+from .terminal_engine import BASE_IMAGE, TerminalEngine, VirtualFileSystem
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv("AURORA_TERMINAL_SNAPSHOT_DIR", "./terminal_sessions")
+# Seconds between background passes that write sessions changed since their last snapshot
+SNAPSHOT_INTERVAL = float(os.getenv("AURORA_TERMINAL_SNAPSHOT_INTERVAL", "5"))
+# Snapshots untouched for this long (seconds) are not restored and get pruned
+SNAPSHOT_TTL = float(os.getenv("AURORA_TERMINAL_SNAPSHOT_TTL", str(24 * 3600)))
+# Most recent commands kept in a snapshot
+SNAPSHOT_HISTORY = int(os.getenv("AURORA_TERMINAL_SNAPSHOT_HISTORY", "1000"))
+
+# Snapshot layout (little-endian). Only the session's overlay is stored; the
+# base image is shared and rebuilt by the server.
+#   header   magic "AXS1", u16 version, u16 flags, u32 entries, u32 whiteouts,
+#            u32 history, u32 generation, f64 saved_at, u32 cwd_off, u32 cwd_len,
+#            u32 owner_off, u32 owner_len (username the session belongs to)
+#   entries  u8 kind, 3 pad, u32 path_off, u32 path_len, u32 data_off, u32 data_len
+#            (file: its content; directory: entry names joined with "/")
+#   spans    u32 off, u32 len per whiteout path, then per history line
+#   heap     UTF-8 strings; offsets above are relative to the heap start
+SNAPSHOT_MAGIC = b"AXS1"
+SNAPSHOT_VERSION = 2
+HEADER = struct.Struct("<4sHHIIIIdIIII")
+ENTRY = struct.Struct("<BxxxIIII")
+SPAN = struct.Struct("<II")
+KIND_FILE = 0
+KIND_DIR = 1
+
+# Session ids become file names, so anything else is never persisted
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+class SnapshotText:
+    # File content still sitting in a mapped snapshot; Inode.text decodes it
+    # on first read, so restoring a session does not touch file bodies
+    __slots__ = ("buffer", "offset", "length")
+
+    def __init__(self, buffer, offset: int, length: int):
+        self.buffer = buffer
+        self.offset = offset
+        self.length = length
+
+    def decode(self) -> str:
+        return str(self.buffer[self.offset:self.offset + self.length], "utf-8")
+
+    def __bytes__(self) -> bytes:
+        return self.buffer[self.offset:self.offset + self.length]
+
+def encode_snapshot(engine: TerminalEngine, owner: str, history_limit: int = SNAPSHOT_HISTORY) -> bytes:
+    vfs = engine.vfs
+    heap = bytearray()
+
+    def put(raw: bytes) -> Tuple[int, int]:
+        offset = len(heap)
+        heap.extend(raw)
+        return offset, len(raw)
+
+    entries = []
+    for path, node in vfs.paths.items():
+        if node.is_dir:
+            kind, raw = KIND_DIR, "/".join(node.children).encode()
+        else:
+            kind, raw = KIND_FILE, node.data.encode() if isinstance(node.data, str) else bytes(node.data)
+        entries.append(ENTRY.pack(kind, *put(path.encode()), *put(raw)))
+    history = list(engine.history)[-history_limit:] if history_limit else []
+    spans = [SPAN.pack(*put(path.encode())) for path in vfs.whiteouts]
+    spans.extend(SPAN.pack(*put(command.encode())) for command in history)
+    cwd = put(vfs.current_path.encode())
+    owner_span = put(owner.encode())
+    header = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(entries), len(vfs.whiteouts), len(history),
+                         engine.generation, time.time(), *cwd, *owner_span)
+    return b"".join([header, *entries, *spans, heap])
+
+def heap_offset(entry_count: int, whiteout_count: int, history_count: int) -> int:
+    return HEADER.size + entry_count * ENTRY.size + (whiteout_count + history_count) * SPAN.size
+
+def snapshot_owner(buffer) -> Optional[str]:
+    # None for a snapshot written by an older version, which has no owner
+    if len(buffer) < HEADER.size:
+        return None
+    magic, version, _, entry_count, whiteout_count, history_count, _, _, _, _, owner_off, owner_len = \
+        HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        return None
+    heap = heap_offset(entry_count, whiteout_count, history_count)
+    return str(buffer[heap + owner_off:heap + owner_off + owner_len], "utf-8")
+
+def decode_snapshot(buffer, base: Optional[VirtualFileSystem] = BASE_IMAGE) -> TerminalEngine:
+    magic, version, _, entry_count, whiteout_count, history_count, generation, _, cwd_off, cwd_len, _, _ = \
+        HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError("not a terminal snapshot")
+    heap = heap_offset(entry_count, whiteout_count, history_count)
+
+    def text(offset: int, length: int) -> str:
+        return str(buffer[heap + offset:heap + offset + length], "utf-8")
+
+    engine = TerminalEngine(base)
+    vfs = engine.vfs
+    position = HEADER.size
+    directories = []
+    for _ in range(entry_count):
+        kind, path_off, path_len, data_off, data_len = ENTRY.unpack_from(buffer, position)
+        position += ENTRY.size
+        path = text(path_off, path_len)
+        name = posixpath.basename(path)
+        if kind == KIND_DIR:
+            names = text(data_off, data_len).split("/") if data_len else []
+            vfs._register(path, vfs._allocate(name, None, dict.fromkeys(names)))
+            directories.append(path)
+        else:
+            vfs._register(path, vfs._allocate(name, None, None, SnapshotText(buffer, heap + data_off, data_len)))
+    for _ in range(whiteout_count):
+        vfs.whiteouts.add(text(*SPAN.unpack_from(buffer, position)))
+        position += SPAN.size
+    for _ in range(history_count):
+        engine.history.append(text(*SPAN.unpack_from(buffer, position)))
+        position += SPAN.size
+
+    # Link entries now that every path resolves; names the current base image
+    # no longer has are dropped
+    for path in directories:
+        node = vfs.paths[path]
+        prefix = path.rstrip("/") + "/"
+        node.children = {name: child for name in node.children
+                         if (child := vfs.lookup(prefix + name)) is not None}
+    for path, node in vfs.paths.items():
+        if path != "/":
+            node.parent = vfs.lookup(posixpath.dirname(path))
+    cwd = text(cwd_off, cwd_len)
+    node = vfs.lookup(cwd)
+    vfs.current_path = cwd if node is not None and node.is_dir else vfs.current_path
+    engine.generation = generation
+    return engine
+
+class TerminalSnapshots:
+    # Keeps terminal sessions alive across dropped WebSockets. A background
+    # task periodically writes a snapshot of each session that ran commands
+    # since its last one (plus a final one when the socket closes); a
+    # reconnect by the same user with the same session id maps the file and
+    # restores it.
+    def __init__(self, directory: str = SNAPSHOT_DIR, interval: float = SNAPSHOT_INTERVAL,
+                 ttl: float = SNAPSHOT_TTL, history: int = SNAPSHOT_HISTORY):
+        self.directory = directory
+        self.interval = interval
+        self.ttl = ttl
+        self.history = history
+        self.sessions: Dict[str, TerminalEngine] = {}
+        # Username each tracked session belongs to, written into its snapshot
+        self.owners: Dict[str, str] = {}
+        # Generation of each session's last written snapshot
+        self.saved: Dict[str, int] = {}
+        self.snapshots_written = 0
+        self.bytes_written = 0
+        self.restored = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def path_for(self, session_id: str) -> Optional[str]:
+        if not SESSION_ID_PATTERN.match(session_id):
+            return None
+        return os.path.join(self.directory, f"{session_id}.snap")
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.prune()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def prune(self):
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp") or (entry.name.endswith(".snap") and entry.stat().st_mtime < cutoff):
+                os.remove(entry.path)
+
+    def track(self, session_id: str, engine: TerminalEngine, owner: str):
+        self.sessions[session_id] = engine
+        self.owners[session_id] = owner
+        self.saved[session_id] = engine.generation
+
+    async def release(self, session_id: str, engine: TerminalEngine):
+        # Final snapshot for a session whose socket closed
+        if self.sessions.get(session_id) is not engine:
+            return
+        del self.sessions[session_id]
+        owner = self.owners.pop(session_id)
+        if engine.generation != self.saved.get(session_id):
+            await self._save(session_id, engine, owner)
+        self.saved.pop(session_id, None)
+
+    async def restore(self, session_id: str, owner: str) -> Optional[TerminalEngine]:
+        # Raises PermissionError when the snapshot belongs to another user
+        path = self.path_for(session_id)
+        if path is None:
+            return None
+        try:
+            engine = await asyncio.to_thread(self._load, path, owner)
+        except PermissionError:
+            raise
+        except Exception:
+            logger.exception("could not restore terminal session %s", session_id)
+            return None
+        if engine is not None:
+            self.restored += 1
+        return engine
+
+    def _load(self, path: str, owner: str) -> Optional[TerminalEngine]:
+        try:
+            with open(path, "rb") as snapshot:
+                if os.fstat(snapshot.fileno()).st_mtime < time.time() - self.ttl:
+                    return None
+                # The mapping outlives the file object; untouched file
+                # contents are only paged in when a command reads them
+                buffer = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        snapshot_user = snapshot_owner(buffer)
+        if snapshot_user is None:
+            # Unowned (older format): started afresh and overwritten on release
+            return None
+        if snapshot_user != owner:
+            raise PermissionError(f"terminal session belongs to {snapshot_user}")
+        return decode_snapshot(buffer)
+
+    async def flush(self):
+        for session_id, engine in list(self.sessions.items()):
+            # Skips sessions released while an earlier one was being written
+            owner = self.owners.get(session_id)
+            if owner is not None and engine.generation != self.saved.get(session_id):
+                await self._save(session_id, engine, owner)
+
+    async def _save(self, session_id: str, engine: TerminalEngine, owner: str):
+        path = self.path_for(session_id)
+        if path is None:
+            return
+        async with self._lock:
+            generation, size = await asyncio.to_thread(self._snapshot, path, engine, owner)
+            if session_id in self.sessions:
+                self.saved[session_id] = generation
+            self.snapshots_written += 1
+            self.bytes_written += size
+
+    def _snapshot(self, path: str, engine: TerminalEngine, owner: str) -> Tuple[int, int]:
+        # Encoded under the engine lock, in between the session's commands
+        with engine.lock:
+            generation = engine.generation
+            data = encode_snapshot(engine, owner, self.history)
+        self._write(path, data)
+        return generation, len(data)
+
+    def _write(self, path: str, data: bytes):
+        # Written beside the old snapshot and swapped in atomically; a mapping
+        # of the previous file stays valid
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as snapshot:
+            snapshot.write(data)
+        os.replace(temporary, path)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("terminal snapshot pass failed")
+
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self.sessions),
+            "dirty": sum(1 for session_id, engine in self.sessions.items()
+                         if engine.generation != self.saved.get(session_id)),
+            "snapshots_written": self.snapshots_written,
+            "bytes_written": self.bytes_written,
+            "restored": self.restored,
+        }
+
+terminal_snapshots = TerminalSnapshots()
@@ -1,38 +1,246 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Optional, Union
 import asyncio
 import json
+import logging
+import os
 import random
+import time
+from collections import deque
 from datetime import datetime
 
+from .binary_frames import TELEMETRY_FIELDS, encode_radar_frame, encode_telemetry_frame
+from .delta import DeltaEncoder, RadarDeltaEncoder, TelemetryDeltaEncoder
+from .host_metrics import SYSTEM_SAMPLE_INTERVAL, host_metrics
+from .shared_simulation import SIMULATION_MODE, SharedSimulation
+from .radar_engine import RadarTargetStore, SpatialGrid, Viewport
+from .telemetry_history import TelemetryHistory
+
+logger = logging.getLogger(__name__)
+
+# Radar scenario size, overridable per deployment
+RADAR_ALLY_COUNT = int(os.getenv("AURORA_RADAR_ALLIES", "3"))
+RADAR_ENEMY_COUNT = int(os.getenv("AURORA_RADAR_ENEMIES", "2"))
+# Delta streams send a keyframe to every subscriber at least this often (in ticks)
+DELTA_KEYFRAME_INTERVAL = int(os.getenv("AURORA_DELTA_KEYFRAME_TICKS", "30"))
+# Telemetry samples kept per history resolution level (7200 = 1 h of raw 0.5 s ticks)
+TELEMETRY_HISTORY_SIZE = int(os.getenv("AURORA_TELEMETRY_HISTORY", "7200"))
+
+# Overflow policies for per-connection send queues
+DROP_OLDEST = "drop_oldest"  # radar/telemetry: newer frames supersede queued ones
+BLOCK = "block"              # terminal output: the producer waits for room
+DISCONNECT = "disconnect"    # event feed: close at once, the client resumes from its cursor
+SEND_POLICIES = (DROP_OLDEST, BLOCK, DISCONNECT)
+
+SEND_QUEUE_SIZE = int(os.getenv("AURORA_SEND_QUEUE_SIZE", "16"))
+TERMINAL_SEND_QUEUE_SIZE = int(os.getenv("AURORA_TERMINAL_SEND_QUEUE_SIZE", "256"))
+# A connection whose queue stays full for this long (seconds) is disconnected; 0 disables
+SEND_MAX_LAG = float(os.getenv("AURORA_SEND_MAX_LAG", "10"))
+
+# WebSocket close code 1013: "Try Again Later"
+WS_CLOSE_LAGGING = 1013
+
+# Send latency (seconds from enqueue to the socket write finishing) above which
+# a subscriber's update rate is halved; it is raised again once latency falls
+# below half of this and the queue is empty
+ADAPTIVE_TARGET_LAG = float(os.getenv("AURORA_ADAPTIVE_TARGET_LAG", "0.25"))
+# Slowest pace relative to the stream's (or requested) rate: 8 = one update in 8
+ADAPTIVE_MAX_SLOWDOWN = float(os.getenv("AURORA_ADAPTIVE_MAX_SLOWDOWN", "8"))
+# Seconds between two adjustments of one subscriber's rate
+ADAPTIVE_ADJUST_INTERVAL = float(os.getenv("AURORA_ADAPTIVE_ADJUST_INTERVAL", "1"))
+# Weight of the newest sample in a connection's smoothed send latency
+LATENCY_SMOOTHING = 0.2
+
+# Seconds before a stream whose step had nothing new (a shared-mode reader
+# waiting for the owner's next tick) looks again
+STEP_RETRY_INTERVAL = 0.01
+
+class ClientConnection:
+    # One WebSocket with a bounded outbound queue drained by its own writer
+    # task, so a slow or stalled client only ever delays itself.
+    def __init__(self, websocket: WebSocket, client_id: str, policy: str = DROP_OLDEST,
+                 max_queue: int = SEND_QUEUE_SIZE, max_lag: float = SEND_MAX_LAG):
+        if policy not in SEND_POLICIES:
+            raise ValueError(f"unknown send policy: {policy}")
+        self.websocket = websocket
+        self.client_id = client_id
+        self.policy = policy
+        self.max_queue = max(1, max_queue)
+        self.max_lag = max_lag
+        self.queue: deque = deque()
+        self.closed = False
+        # Counters exposed through stats()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.max_depth = 0
+        self.full_since: Optional[float] = None
+        # Smoothed seconds a frame spends queued and being written
+        self.latency = 0.0
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._writer: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+    
+    @property
+    def depth(self) -> int:
+        return len(self.queue)
+    
+    async def send(self, message: Union[str, bytes]) -> bool:
+        # Returns False once the connection is closed, so producers can drop it
+        if self.closed:
+            return False
+        if len(self.queue) >= self.max_queue:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            if self.full_since is None:
+                self.full_since = now
+            elif self.max_lag and now - self.full_since > self.max_lag:
+                await self.close(WS_CLOSE_LAGGING)
+                return False
+            if self.policy == DROP_OLDEST:
+                self.queue.popleft()
+                self.frames_dropped += 1
+            elif self.policy == DISCONNECT:
+                self.frames_dropped += 1
+                await self.close(WS_CLOSE_LAGGING)
+                return False
+            else:
+                self._not_full.clear()
+                timeout = self.max_lag - (now - self.full_since) if self.max_lag else None
+                try:
+                    await asyncio.wait_for(self._not_full.wait(), timeout)
+                except asyncio.TimeoutError:
+                    await self.close(WS_CLOSE_LAGGING)
+                    return False
+                if self.closed:
+                    return False
+        self.queue.append((message, time.monotonic()))
+        if len(self.queue) > self.max_depth:
+            self.max_depth = len(self.queue)
+        self._not_empty.set()
+        return True
+    
+    async def _write_loop(self):
+        websocket = self.websocket
+        try:
+            while True:
+                while not self.queue:
+                    self._not_empty.clear()
+                    await self._not_empty.wait()
+                message, enqueued = self.queue.popleft()
+                if len(self.queue) <= self.max_queue // 2:
+                    self.full_since = None
+                self._not_full.set()
+                if isinstance(message, bytes):
+                    await websocket.send_bytes(message)
+                else:
+                    await websocket.send_text(message)
+                self.frames_sent += 1
+                self.latency += (time.monotonic() - enqueued - self.latency) * LATENCY_SMOOTHING
+        except Exception:
+            # The socket is gone; the endpoint handler sees the disconnect itself
+            self._mark_closed()
+    
+    def _mark_closed(self):
+        self.closed = True
+        self.queue.clear()
+        # Wake producers blocked on a full queue
+        self._not_full.set()
+    
+    async def close(self, code: int = 1000):
+        if self.closed:
+            return
+        self._mark_closed()
+        self.stop()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+    
+    def stop(self):
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self._writer = None
+    
+    def stats(self) -> dict:
+        return {
+            # Endpoint only ("radar", "terminal", ...); ids stay private
+            "kind": self.client_id.partition(":")[0],
+            "policy": self.policy,
+            "queue_depth": len(self.queue),
+            "max_queue_depth": self.max_depth,
+            "queue_capacity": self.max_queue,
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "lagging": self.full_since is not None,
+            "latency_ms": round(self.latency * 1000, 1),
+            "closed": self.closed,
+        }
+
+class AdaptiveRate:
+    # Paces one subscriber from its connection's send latency and queue depth:
+    # `factor` multiplies the base interval, doubling while the client lags
+    # and shrinking gradually once it keeps up, but never below 1 (the rate
+    # the stream or the client asked for) or above ADAPTIVE_MAX_SLOWDOWN
+    __slots__ = ("factor", "adjusted_at")
+
+    def __init__(self):
+        self.factor = 1.0
+        self.adjusted_at = 0.0
+
+    def update(self, connection: ClientConnection, now: float) -> float:
+        if now - self.adjusted_at >= ADAPTIVE_ADJUST_INTERVAL:
+            self.adjusted_at = now
+            if connection.latency > ADAPTIVE_TARGET_LAG or connection.depth > 1:
+                self.factor = min(self.factor * 2, ADAPTIVE_MAX_SLOWDOWN)
+            elif connection.latency < ADAPTIVE_TARGET_LAG / 2 and connection.depth == 0:
+                self.factor = max(1.0, self.factor * 0.75)
+        return self.factor
+
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.terminal_sessions: Dict[str, Dict] = {}
+        self.active_connections: Dict[str, ClientConnection] = {}
     
-    async def connect(self, websocket: WebSocket, client_id: str):
-        await websocket.accept()
-        self.active_connections[client_id] = websocket
+    async def connect(self, websocket: WebSocket, client_id: str, policy: str = DROP_OLDEST,
+                      max_queue: int = SEND_QUEUE_SIZE, subprotocol: Optional[str] = None) -> ClientConnection:
+        await websocket.accept(subprotocol=subprotocol)
+        connection = ClientConnection(websocket, client_id, policy, max_queue)
+        connection.start()
+        previous = self.active_connections.get(client_id)
+        if previous is not None:
+            previous.stop()
+        self.active_connections[client_id] = connection
+        return connection
     
     def disconnect(self, client_id: str):
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-        if client_id in self.terminal_sessions:
-            del self.terminal_sessions[client_id]
+        connection = self.active_connections.pop(client_id, None)
+        if connection is not None:
+            connection.stop()
     
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
     
     async def broadcast(self, message: str):
-        for connection in self.active_connections.values():
-            await connection.send_text(message)
+        # Only enqueues; each connection's writer task does the actual send
+        connections = list(self.active_connections.values())
+        await asyncio.gather(*(connection.send(message) for connection in connections))
     
     async def send_json(self, data: dict, websocket: WebSocket):
         await websocket.send_json(data)
+    
+    def stats(self) -> List[dict]:
+        return [connection.stats() for connection in self.active_connections.values()]
 
 class SimulationManager:
-    def __init__(self):
-        self.radar_targets = []
+    def __init__(self, ally_count: int = RADAR_ALLY_COUNT, enemy_count: int = RADAR_ENEMY_COUNT):
+        self.ally_count = ally_count
+        self.enemy_count = enemy_count
+        self.radar_targets = RadarTargetStore(capacity=ally_count + enemy_count)
+        self.radar_index = SpatialGrid(self.radar_targets)
         self.telemetry_data = {
             "altitude": 35000,
             "speed": 0.85,
@@ -44,38 +252,21 @@ class SimulationManager:
             "heading": 270,
             "status": "NOMINAL"
         }
+        self.telemetry_history = TelemetryHistory(TELEMETRY_FIELDS, capacity=TELEMETRY_HISTORY_SIZE)
         self.generate_radar_targets()
     
-    def generate_radar_targets(self):
-        self.radar_targets = []
-        # Generate allies
-        for i in range(3):
-            self.radar_targets.append({
-                "id": f"ally_{i}",
-                "x": random.uniform(-60, 60),
-                "y": random.uniform(-60, 60),
-                "type": "ally",
-                "distance": random.randint(50, 200),
-                "bearing": random.randint(0, 360)
-            })
-        # Generate enemies
-        for i in range(2):
-            self.radar_targets.append({
-                "id": f"enemy_{i}",
-                "x": random.uniform(-80, 80),
-                "y": random.uniform(-80, 80),
-                "type": "enemy",
-                "distance": random.randint(100, 300),
-                "bearing": random.randint(0, 360)
-            })
+    def generate_radar_targets(self, ally_count: Optional[int] = None, enemy_count: Optional[int] = None):
+        if ally_count is not None:
+            self.ally_count = ally_count
+        if enemy_count is not None:
+            self.enemy_count = enemy_count
+        self.radar_targets.clear()
+        self.radar_targets.spawn("ally", self.ally_count)
+        self.radar_targets.spawn("enemy", self.enemy_count)
     
     def update_radar(self):
-        for target in self.radar_targets:
-            # Move targets slightly
-            target["x"] += random.uniform(-2, 2)
-            target["y"] += random.uniform(-2, 2)
-            target["distance"] += random.uniform(-5, 5)
-            target["bearing"] = (target["bearing"] + random.uniform(-2, 2)) % 360
+        # Move every target slightly in one batched step
+        self.radar_targets.step()
     
     def update_telemetry(self):
         # Simulate changing telemetry data
@@ -93,17 +284,209 @@ class SimulationManager:
         self.telemetry_data["speed"] = max(0.5, min(2.0, self.telemetry_data["speed"]))
         self.telemetry_data["fuel"] = max(0, min(100, self.telemetry_data["fuel"]))
         self.telemetry_data["temperature"] = max(100, min(1000, self.telemetry_data["temperature"]))
+        
+        self.telemetry_history.append(time.time(), self.telemetry_data)
     
-    def get_radar_data(self):
-        self.update_radar()
+    def radar_snapshot(self, viewport: Optional[Viewport] = None):
+        # Read-only view of the current radar state (does not advance it),
+        # limited to the targets inside the given viewport
+        rows = self.radar_index.query_viewport(viewport)
         return {
-            "targets": self.radar_targets,
+            "targets": self.radar_targets.to_dicts(rows),
             "timestamp": datetime.now().isoformat()
         }
     
+    def telemetry_snapshot(self, view=None):
+        return self.telemetry_data
+    
+    def radar_binary_snapshot(self, viewport: Optional[Viewport] = None, tick: int = 0) -> bytes:
+        return encode_radar_frame(self.radar_targets, self.radar_index.query_viewport(viewport), tick)
+    
+    def telemetry_binary_snapshot(self, view=None, tick: int = 0) -> bytes:
+        return encode_telemetry_frame(self.telemetry_data, tick)
+    
+    def get_radar_data(self, viewport: Optional[Viewport] = None):
+        self.update_radar()
+        return self.radar_snapshot(viewport)
+    
     def get_telemetry_data(self):
         self.update_telemetry()
-        return self.telemetry_data
+        return self.telemetry_snapshot()
+
+STREAM_MODES = ("full", "delta")
+STREAM_FORMATS = ("json", "binary")
+
+class Subscription:
+    __slots__ = ("view", "mode", "format", "needs_keyframe", "pace", "next_tick")
+
+    def __init__(self, view: Any = None, mode: str = "full", format: str = "json",
+                 pace: Optional[AdaptiveRate] = None):
+        self.view = view
+        self.mode = mode
+        self.format = format
+        self.needs_keyframe = True
+        # Full-frame subscribers on their own socket skip ticks while they lag;
+        # delta subscribers cannot, since every delta builds on the one before
+        self.pace = pace
+        self.next_tick = 0
+
+# One background tick per stream: the simulation advances once per tick and the
+# frame is serialized once per distinct subscriber view (e.g. radar viewport)
+# and mode, then the same text is fanned out to every subscriber sharing it.
+class StreamBroadcaster:
+
+    def __init__(self, name: str, step: Callable[[], None], snapshot: Callable[[Any], dict], interval: float,
+                 encoder_factory: Optional[Callable[[Any], DeltaEncoder]] = None,
+                 binary_snapshot: Optional[Callable[[Any, int], bytes]] = None):
+        self.name = name
+        self.step = step
+        self.snapshot = snapshot
+        self.interval = interval
+        self.encoder_factory = encoder_factory
+        self.binary_snapshot = binary_snapshot
+        self.subscribers: Dict[ClientConnection, Subscription] = {}
+        # One delta encoder per view that currently has delta subscribers
+        self.encoders: Dict[Any, DeltaEncoder] = {}
+        self.tick = 0
+        # Monotonic time of the current tick; JSON frames carry it as "ts" so
+        # clients can interpolate between samples
+        self.tick_time = 0.0
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def subscribe(self, connection: ClientConnection, view: Any = None, mode: str = "full", format: str = "json"):
+        if mode not in STREAM_MODES or (mode == "delta" and self.encoder_factory is None):
+            raise ValueError(f"unsupported {self.name} stream mode: {mode}")
+        # Binary frames are full frames only
+        if format not in STREAM_FORMATS or (format == "binary" and (self.binary_snapshot is None or mode != "full")):
+            raise ValueError(f"unsupported {self.name} stream format: {format}")
+        pace = AdaptiveRate() if mode == "full" and isinstance(connection, ClientConnection) else None
+        self.subscribers[connection] = Subscription(view, mode, format, pace)
+    
+    def set_view(self, connection: ClientConnection, view: Any):
+        subscription = self.subscribers.get(connection)
+        if subscription is not None:
+            subscription.view = view
+            subscription.needs_keyframe = True
+    
+    def request_resync(self, connection: ClientConnection):
+        subscription = self.subscribers.get(connection)
+        if subscription is not None:
+            subscription.needs_keyframe = True
+    
+    def unsubscribe(self, connection: ClientConnection):
+        self.subscribers.pop(connection, None)
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            # A failing tick is logged and skipped so the stream keeps running
+            try:
+                if self.step() is False:
+                    await asyncio.sleep(STEP_RETRY_INTERVAL)
+                    next_tick = loop.time()
+                    continue
+                self.tick += 1
+                self.tick_time = time.monotonic()
+                if self.subscribers:
+                    await self._fan_out(self._encode_frames())
+                else:
+                    self.encoders.clear()
+            except Exception:
+                logger.exception("%s stream tick failed", self.name)
+                # Encoders may have advanced for a frame nobody received
+                for subscription in self.subscribers.values():
+                    subscription.needs_keyframe = True
+            # Fixed-rate schedule: a slow tick does not push every later one back
+            next_tick += self.interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+    
+    def _encode_frames(self) -> Dict[ClientConnection, Union[str, bytes]]:
+        full: Dict[Any, Union[str, bytes]] = {}
+        deltas: Dict[Any, Optional[str]] = {}
+        keyframes: Dict[Any, str] = {}
+        frames = {}
+        ts = round(self.tick_time, 3)
+        for connection, subscription in self.subscribers.items():
+            view = subscription.view
+            if subscription.mode == "full":
+                if subscription.pace is not None:
+                    if self.tick < subscription.next_tick:
+                        continue
+                    subscription.next_tick = self.tick + round(subscription.pace.update(connection, self.tick_time))
+                key = (view, subscription.format)
+                message = full.get(key)
+                if message is None:
+                    if subscription.format == "binary":
+                        message = self.binary_snapshot(view, self.tick)
+                    else:
+                        message = json.dumps({**self.snapshot(view), "ts": ts})
+                    full[key] = message
+                frames[connection] = message
+                continue
+
+            if view not in deltas:
+                encoder = self.encoders.get(view)
+                if encoder is None:
+                    encoder = self.encoders[view] = self.encoder_factory(view)
+                keyframe_due, delta = encoder.encode()
+                deltas[view] = None if delta is None else json.dumps({**delta, "ts": ts})
+                if keyframe_due:
+                    keyframes[view] = json.dumps({**encoder.keyframe(), "ts": ts})
+            encoder = self.encoders[view]
+            if subscription.needs_keyframe or view in keyframes:
+                message = keyframes.get(view)
+                if message is None:
+                    message = keyframes[view] = json.dumps({**encoder.keyframe(), "ts": ts})
+                subscription.needs_keyframe = False
+                frames[connection] = message
+            elif deltas[view] is not None:
+                frames[connection] = deltas[view]
+
+        # Encoders for views nobody watches any more would only drift
+        for view in list(self.encoders):
+            if view not in deltas:
+                del self.encoders[view]
+        return frames
+    
+    async def _fan_out(self, frames: Dict[ClientConnection, Union[str, bytes]]):
+        # Enqueue only: each connection's writer task sends at its own pace, and
+        # drop-oldest queues never make the tick wait for a slow client
+        connections = list(frames)
+        results = await asyncio.gather(*(connection.send(frames[connection]) for connection in connections))
+        for connection, queued in zip(connections, results):
+            if not queued:
+                self.unsubscribe(connection)
 
 manager = ConnectionManager()
 simulation = SimulationManager()
+# In shared mode the streams step through the shared simulation instead (see main.startup_event)
+shared_simulation = SharedSimulation(simulation) if SIMULATION_MODE == "shared" else None
+
+radar_stream = StreamBroadcaster(
+    "radar", shared_simulation.step_radar if shared_simulation else simulation.update_radar,
+    simulation.radar_snapshot, 1.0,
+    encoder_factory=lambda view: RadarDeltaEncoder(simulation, view, DELTA_KEYFRAME_INTERVAL),
+    binary_snapshot=simulation.radar_binary_snapshot
+)
+telemetry_stream = StreamBroadcaster(
+    "telemetry", shared_simulation.step_telemetry if shared_simulation else simulation.update_telemetry,
+    simulation.telemetry_snapshot, 0.5,
+    encoder_factory=lambda view: TelemetryDeltaEncoder(simulation, DELTA_KEYFRAME_INTERVAL),
+    binary_snapshot=simulation.telemetry_binary_snapshot
+)
+# Host load from /proc, sampled once per tick for every subscriber
+system_stream = StreamBroadcaster("system", host_metrics.sample, host_metrics.snapshot, SYSTEM_SAMPLE_INTERVAL)
@@ -16,11 +16,8 @@ class AuroraOS {
         // Initialize desktop
         this.initDesktop();
         
-        // Connect WebSockets
+        // Connect WebSockets (system status, telemetry, radar and system events)
         this.connectWebSockets();
-        
-        // Start system monitor
-        this.startSystemMonitor();
     }
 
     async checkAuth() {
@@ -114,85 +111,57 @@ class AuroraOS {
     }
 
     connectWebSockets() {
-        // Connect to system WebSocket
-        this.connectSystemWS();
-        
-        // Connect to telemetry WebSocket
-        this.connectTelemetryWS();
-        
-        // Connect to radar WebSocket
-        this.connectRadarWS();
-    }
-
-    connectSystemWS() {
-        const ws = new WebSocket(`ws://${window.location.host}/ws/system`);
-        
-        ws.onopen = () => {
-            console.log('System WebSocket connected');
-        };
-        
-        ws.onmessage = (event) => {
-            const data = JSON.parse(event.data);
-            this.updateSystemStatus(data);
-        };
-        
-        ws.onerror = (error) => {
-            console.error('System WebSocket error:', error);
-        };
-        
-        ws.onclose = () => {
-            setTimeout(() => this.connectSystemWS(), 3000);
-        };
-        
-        this.websockets.system = ws;
-    }
-
-    connectTelemetryWS() {
-        const ws = new WebSocket(`ws://${window.location.host}/ws/telemetry`);
-        
-        ws.onopen = () => {
-            console.log('Telemetry WebSocket connected');
-        };
-        
-        ws.onmessage = (event) => {
-            const data = JSON.parse(event.data);
-            this.updateTelemetry(data);
-        };
-        
-        ws.onerror = (error) => {
-            console.error('Telemetry WebSocket error:', error);
-        };
-        
-        ws.onclose = () => {
-            setTimeout(() => this.connectTelemetryWS(), 3000);
-        };
-        
-        this.websockets.telemetry = ws;
-    }
-
-    connectRadarWS() {
-        const ws = new WebSocket(`ws://${window.location.host}/ws/radar`);
-        
-        ws.onopen = () => {
-            console.log('Radar WebSocket connected');
-        };
-        
-        ws.onmessage = (event) => {
-            const data = JSON.parse(event.data);
-            if (window.radarApp) {
-                window.radarApp.updateTargets(data.targets);
-            }
-        };
-        
-        ws.onerror = (error) => {
-            console.error('Radar WebSocket error:', error);
-        };
-        
-        ws.onclose = () => {
-            setTimeout(() => this.connectRadarWS(), 3000);
+        // One multiplexed socket carries every desktop stream: each frame tags
+        // the topics it updates, and updates from the same tick arrive together.
+        // New system events resume after the last event id seen, so nothing is
+        // missed across reconnects. Radar is requested in the binary format and
+        // arrives as separate binary messages, decoded into typed arrays by
+        // radar.js. The multiplexer only sends each topic's latest state, so
+        // the delta format of /ws/radar does not apply here.
+        let cursor = null;
+        const connect = () => {
+            const ws = new WebSocket(`ws://${window.location.host}/ws?topics=system:0.5,telemetry:2,radar:1&range=100&format=binary`);
+            ws.binaryType = 'arraybuffer';
+            
+            ws.onopen = () => {
+                console.log('Multiplexed WebSocket connected');
+                ws.send(JSON.stringify({ subscribe: 'system_events', after: cursor }));
+            };
+            
+            ws.onmessage = (event) => {
+                if (event.data instanceof ArrayBuffer) {
+                    if (window.radarApp) {
+                        window.radarApp.updateFromBinary(event.data);
+                    }
+                    return;
+                }
+                const topics = JSON.parse(event.data).topics;
+                if (topics.system) {
+                    this.updateSystemStatus(topics.system);
+                }
+                if (topics.telemetry) {
+                    this.updateTelemetry(topics.telemetry);
+                }
+                if (topics.radar && window.radarApp) {
+                    window.radarApp.updateTargets(topics.radar.targets, topics.radar.ts);
+                }
+                (topics.system_events || []).forEach(message => {
+                    cursor = message.cursor;
+                    this.processSystemEvents(message.events);
+                });
+            };
+            
+            ws.onerror = (error) => {
+                console.error('Multiplexed WebSocket error:', error);
+            };
+            
+            ws.onclose = () => {
+                setTimeout(connect, 3000);
+            };
+            
+            this.websockets.multiplex = ws;
         };
-        
-        this.websockets.radar = ws;
+        connect();
     }
 
     updateSystemStatus(data) {
@@ -243,22 +212,9 @@ class AuroraOS {
         }
     }
 
-    startSystemMonitor() {
-        // Periodically check system health
-        setInterval(async () => {
-            try {
-                const response = await fetch('/api/system/events');
-                const events = await response.json();
-                this.processSystemEvents(events);
-            } catch (error) {
-                console.error('Failed to fetch system events:', error);
-            }
-        }, 10000);
-    }
-
     processSystemEvents(events) {
         // Process and display system events
-        const criticalEvents = events.filter(e => e.status === 'critical');
+        const criticalEvents = events.filter(e => e.severity === 'critical');
         if (criticalEvents.length > 0) {
             this.showAlert('SYSTEM ALERT', criticalEvents[0].message, 'critical');
         }
@@ -1,5 +1,39 @@
 // Radar Application with Canvas
 
+const RADAR_TARGET_TYPES = ['ally', 'enemy'];
+const RADAR_FRAME_HEADER_SIZE = 24;
+
+// Decodes a binary radar frame (see backend/binary_frames.py) into typed
+// arrays that view the received buffer directly, without copying.
+function decodeRadarFrame(buffer) {
+    const header = new DataView(buffer, 0, RADAR_FRAME_HEADER_SIZE);
+    const magic = String.fromCharCode(
+        header.getUint8(0), header.getUint8(1), header.getUint8(2), header.getUint8(3)
+    );
+    if (magic !== 'AXR1') {
+        throw new Error(`Unexpected radar frame magic: ${magic}`);
+    }
+    const count = header.getUint32(12, true);
+    let offset = RADAR_FRAME_HEADER_SIZE;
+    const column = (ArrayType) => {
+        const array = new ArrayType(buffer, offset, count);
+        offset += count * ArrayType.BYTES_PER_ELEMENT;
+        return array;
+    };
+    return {
+        version: header.getUint16(4, true),
+        tick: header.getUint32(8, true),
+        timestamp: header.getFloat64(16, true),
+        count: count,
+        ids: column(Uint32Array),
+        x: column(Float32Array),
+        y: column(Float32Array),
+        distance: column(Float32Array),
+        bearing: column(Float32Array),
+        type: column(Uint8Array)
+    };
+}
+
 class RadarApp {
     constructor() {
         this.canvas = null;
@@ -7,6 +41,10 @@ class RadarApp {
         this.targets = [];
         this.sweepAngle = 0;
         this.animationId = null;
+        // Sample time ("ts", server monotonic seconds) of the latest frame and
+        // how its targets move in from the previous one
+        this.frameTs = null;
+        this.motion = null;
     }
 
     init(canvasId) {
@@ -34,14 +72,69 @@ class RadarApp {
         ];
     }
 
-    updateTargets(targets) {
-        this.targets = targets.map(target => ({
-            x: target.x,
-            y: target.y,
-            type: target.type,
-            distance: target.distance,
-            bearing: target.bearing
-        }));
+    updateTargets(targets, ts) {
+        // With sample timestamps, each target glides from where it is drawn now
+        // to its new position over the time between the two samples, so motion
+        // stays smooth however often the server sends frames
+        const shown = new Map();
+        if (Array.isArray(this.targets)) {
+            this.forEachTarget(target => shown.set(target.id, target));
+        }
+        this.targets = targets.map(target => {
+            const from = shown.get(target.id) || target;
+            return {
+                id: target.id,
+                x: target.x,
+                y: target.y,
+                fromX: from.x,
+                fromY: from.y,
+                type: target.type,
+                distance: target.distance,
+                bearing: target.bearing
+            };
+        });
+        const interval = ts !== undefined && this.frameTs !== null ? ts - this.frameTs : 0;
+        this.motion = interval > 0 ? { start: performance.now(), duration: interval * 1000 } : null;
+        this.frameTs = ts === undefined ? null : ts;
+    }
+
+    updateFromBinary(buffer) {
+        // Targets stay in typed arrays; drawRadar reads the columns directly
+        this.targets = decodeRadarFrame(buffer);
+        this.motion = null;
+    }
+
+    forEachTarget(callback) {
+        const targets = this.targets;
+        if (Array.isArray(targets)) {
+            const motion = this.motion;
+            const progress = motion ? Math.min(1, (performance.now() - motion.start) / motion.duration) : 1;
+            targets.forEach(target => {
+                if (progress >= 1 || target.fromX === undefined) {
+                    callback(target);
+                    return;
+                }
+                callback(Object.assign({}, target, {
+                    x: target.fromX + (target.x - target.fromX) * progress,
+                    y: target.fromY + (target.y - target.fromY) * progress
+                }));
+            });
+            return;
+        }
+        for (let i = 0; i < targets.count; i++) {
+            callback({
+                id: `${RADAR_TARGET_TYPES[targets.type[i]]}_${targets.ids[i]}`,
+                x: targets.x[i],
+                y: targets.y[i],
+                type: RADAR_TARGET_TYPES[targets.type[i]],
+                distance: targets.distance[i],
+                bearing: targets.bearing[i]
+            });
+        }
+    }
+
+    targetCount() {
+        return Array.isArray(this.targets) ? this.targets.length : this.targets.count;
     }
 
     drawRadar() {
@@ -110,7 +203,7 @@ class RadarApp {
         this.ctx.stroke();
         
         // Draw targets
-        this.targets.forEach(target => {
+        this.forEachTarget(target => {
             const scale = radius / 100;
             const targetX = centerX + target.x * scale;
             const targetY = centerY + target.y * scale;
@@ -138,7 +231,7 @@ class RadarApp {
             this.ctx.fillStyle = '#ffffff';
             this.ctx.font = '10px monospace';
             this.ctx.fillText(
-                `${target.type.toUpperCase()} ${target.distance}km`,
+                `${target.type.toUpperCase()} ${target.distance.toFixed(0)}km`,
                 targetX + 10,
                 targetY - 10
             );
@@ -152,7 +245,7 @@ class RadarApp {
         // Draw radar info
         this.ctx.fillStyle = '#00ff00';
         this.ctx.font = '14px monospace';
-        this.ctx.fillText(`AURORA-X RADAR | TARGETS: ${this.targets.length}`, 10, 20);
+        this.ctx.fillText(`AURORA-X RADAR | TARGETS: ${this.targetCount()}`, 10, 20);
         this.ctx.fillText(`SWEEP: ${this.sweepAngle.toFixed(0)}°`, 10, 40);
         
         // Update sweep angle
@@ -173,3 +266,4 @@ class RadarApp {
 
 // Export to global scope
 window.radarApp = new RadarApp();
+window.decodeRadarFrame = decodeRadarFrame;
@@ -8,6 +8,7 @@ class TerminalApp {
         this.commandHistory = [];
         this.historyIndex = -1;
         this.currentCommand = '';
+        this.pendingCommand = null;
     }
 
     init(containerId) {
@@ -43,8 +44,9 @@ class TerminalApp {
         this.term.open(document.getElementById(containerId));
         fitAddon.fit();
         
-        // Initialize session
-        this.sessionId = 'terminal_' + Date.now();
+        // Reuse the session id across reloads so the server restores its snapshot
+        this.sessionId = sessionStorage.getItem('aurora_terminal_id') || this.newSessionId();
+        
         
         // Connect to WebSocket
         this.connectWebSocket();
@@ -56,25 +58,54 @@ class TerminalApp {
         this.showWelcomeMessage();
     }
 
+    newSessionId() {
+        // crypto.randomUUID only exists in secure contexts; plain http falls back to getRandomValues
+        const id = window.crypto.randomUUID
+            ? crypto.randomUUID()
+            : Array.from(crypto.getRandomValues(new Uint8Array(16)), (b) => b.toString(16).padStart(2, '0')).join('');
+        sessionStorage.setItem('aurora_terminal_id', id);
+        return id;
+    }
+
     connectWebSocket() {
-        this.socket = new WebSocket(`ws://${window.location.host}/ws/terminal/${this.sessionId}`);
+        const token = encodeURIComponent(localStorage.getItem('token') || '');
+        this.socket = new WebSocket(`ws://${window.location.host}/ws/terminal/${this.sessionId}?token=${token}`);
         
         this.socket.onopen = () => {
             this.term.writeln('\r\n\x1b[32mConnected to Aurora-X Terminal\x1b[0m');
-            this.writePrompt();
+            if (this.pendingCommand) {
+                // Typed while the session was suspended
+                this.socket.send(this.pendingCommand);
+                this.pendingCommand = null;
+            } else {
+                this.writePrompt();
+            }
         };
         
+        // Command output arrives in chunks as it is produced, ending with the prompt
         this.socket.onmessage = (event) => {
             this.term.write(event.data);
         };
         
         this.socket.onerror = (error) => {
-            this.term.writeln('\r\n\x1b[31mWebSocket error. Reconnecting...\x1b[0m');
-            setTimeout(() => this.connectWebSocket(), 3000);
+            this.term.writeln('\r\n\x1b[31mWebSocket error\x1b[0m');
         };
         
-        this.socket.onclose = () => {
-            this.term.writeln('\r\n\x1b[33mConnection closed\x1b[0m');
+        // The session survives on the server, so reconnecting resumes it
+        this.socket.onclose = (event) => {
+            if (event.code === 1008) {
+                // Not logged in, or the session belongs to another user: Enter opens a new one
+                this.sessionId = this.newSessionId();
+                this.term.writeln('\r\n\x1b[31mTerminal access denied. Log in and press Enter to retry.\x1b[0m');
+                return;
+            }
+            if (event.code === 4000) {
+                // Closed by the server (idle, or opened elsewhere): resume on the next Enter
+                this.term.writeln('\r\n\x1b[33mSession suspended. Press Enter to resume.\x1b[0m');
+                return;
+            }
+            this.term.writeln('\r\n\x1b[33mConnection closed. Reconnecting...\x1b[0m');
+            setTimeout(() => this.connectWebSocket(), 3000);
         };
     }
 
@@ -100,8 +131,14 @@ class TerminalApp {
         this.term.onData((data) => {
             // Handle special keys that aren't captured by onKey
             if (data === '\x03') { // Ctrl+C
-                this.term.write('^C\r\n');
-                this.writePrompt();
+                // The server stops the running command and answers with a prompt
+                this.term.write('^C');
+                this.currentCommand = '';
+                if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+                    this.socket.send('\x03');
+                } else {
+                    this.writePrompt();
+                }
             }
         });
     }
@@ -109,6 +146,10 @@ class TerminalApp {
     handleEnter() {
         const command = this.currentCommand.trim();
         
+        if (this.socket && this.socket.readyState === WebSocket.CLOSED) {
+            this.connectWebSocket();
+        }
+        
         if (command) {
             this.commandHistory.push(command);
             this.historyIndex = this.commandHistory.length;
@@ -116,6 +157,8 @@ class TerminalApp {
             // Send command to server
             if (this.socket && this.socket.readyState === WebSocket.OPEN) {
                 this.socket.send(command);
+            } else {
+                this.pendingCommand = command;
             }
             
             this.currentCommand = '';
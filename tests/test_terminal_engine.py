@@ -0,0 +1,36 @@
+# tests/test_terminal_engine.py
+
+from backend.terminal_engine import TerminalEngine
+
+def paths(vfs):
+    return sorted(path for path, _ in vfs.walk("/"))
+
+def test_cp_root_is_rejected():
+    engine = TerminalEngine()
+    before = paths(engine.vfs)
+    assert engine.vfs.cp("/", "/home/x") == "cp: cannot copy '/' into itself"
+    assert paths(engine.vfs) == before
+    # The path map is intact, so a recursive search still runs
+    assert engine.process_command("grep -r foo /") == ""
+
+def test_cp_directory_into_itself_is_rejected():
+    engine = TerminalEngine()
+    engine.vfs.mkdir("/home/a")
+    engine.vfs.mkdir("/home/a/b")
+    before = paths(engine.vfs)
+    assert engine.vfs.cp("/home/a", "/home/a/b") == "cp: cannot copy '/home/a' into itself"
+    assert engine.vfs.cp("/home/a", "/home/a/c") == "cp: cannot copy '/home/a' into itself"
+    assert paths(engine.vfs) == before
+
+def test_cp_directory_next_to_itself():
+    engine = TerminalEngine()
+    engine.vfs.mkdir("/home/a")
+    engine.vfs.write("/home/a/notes.txt", "hello")
+    assert engine.vfs.cp("/home/a", "/home/ab") == ""
+    assert engine.vfs.cat("/home/ab/notes.txt") == "hello"
+
+def test_mv_root_and_into_itself_are_rejected():
+    engine = TerminalEngine()
+    engine.vfs.mkdir("/home/a")
+    assert engine.vfs.mv("/", "/home/x").startswith("mv: cannot stat")
+    assert engine.vfs.mv("/home/a", "/home/a/b") == "mv: cannot move '/home/a' to a subdirectory of itself"